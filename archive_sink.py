@@ -0,0 +1,249 @@
+"""
+Zip/tar archive sink: streams a whole library into one archive instead of thousands of files.
+
+ArchiveSink plugs into the generators like any other Sink, so clips keep their usual relative
+paths (house/variation_1/kick_house_1.mid, ...) inside the archive. Archive bytes are
+gathered in memory and written to the file in large blocks. Clips are stored uncompressed by
+default: MIDI clips are tiny, so compression saves little and costs time.
+
+Alongside the archive, an index (archive path + ".index.json") records the byte offset and
+length of every clip. ArchiveReader uses it to read any clip with a single seek and read,
+without unpacking or scanning the archive. Without the index, the reader rebuilds the same
+table from the archive's own directory.
+
+Usage:
+    with ArchiveSink("library.zip") as sink:
+        for genre in ("house", "ukg", "dnb"):
+            generate_midi_patterns(genre, None, num_variations=1000, seed_base=1000, sink=sink)
+
+    with ArchiveReader("library.zip") as archive:
+        data = archive.read("dnb/variation_7/kick_dnb_7.mid")
+"""
+import io
+import json
+import os
+import struct
+import tarfile
+import time
+import zipfile
+
+from output_sinks import PathClaims, Sink
+
+ARCHIVE_FORMATS = ("zip", "tar")
+INDEX_SUFFIX = ".index.json"
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def _infer_format(path):
+    """Returns (format, compress) implied by an archive file name."""
+    name = str(path).lower()
+    if name.endswith(".zip"):
+        return "zip", None
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tar", True
+    if name.endswith(".tar"):
+        return "tar", None
+    raise ValueError("Cannot infer the archive format; pass format='zip' or format='tar'.")
+
+
+class _BlockWriter(io.RawIOBase):
+    """
+    Append-only stream that gathers small writes and passes them on in blocks of buffer_size.
+
+    It reports itself as not seekable, so zipfile writes each entry once, with its CRC and sizes
+    in a trailing data descriptor, instead of seeking back to patch the header (which would
+    flush the buffer on every clip).
+    """
+
+    def __init__(self, raw, buffer_size):
+        self._raw = raw
+        self._buffer_size = buffer_size
+        self._pending = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        self._pending += data
+        self._position += len(data)
+        if len(self._pending) >= self._buffer_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._pending:
+            self._raw.write(self._pending)
+            self._pending = bytearray()
+        self._raw.flush()
+
+
+class ArchiveSink(Sink):
+    """
+    Sink that writes every clip into a single zip or tar archive.
+
+    Parameters:
+        path (str or file object): Archive file to create, or a binary stream to write it to
+            (e.g. a socket's makefile("wb") or sys.stdout.buffer).
+        format (str or None): "zip" or "tar"; inferred from a file name if None (".zip", ".tar",
+            ".tar.gz" / ".tgz").
+        compress (bool or None): Deflate zip entries / gzip the tar stream. Defaults to False
+            (except for ".tar.gz" names); uncompressed archives are faster to write and
+            support direct random access.
+        buffer_size (int): Size of the blocks written to the underlying file.
+        index_path (str or None): Where to write the JSON offset index. Defaults to
+            path + ".index.json" when path is a file name; no index file is written for streams
+            unless this is given. The same table is always available as the index attribute.
+
+    Attributes:
+        index (dict): Relative path -> (data offset, length) of each clip in the archive.
+    """
+
+    def __init__(self, path, format=None, compress=None, buffer_size=DEFAULT_BUFFER_SIZE, index_path=None):
+        is_name = isinstance(path, (str, os.PathLike))
+        inferred_format, inferred_compress = _infer_format(path) if is_name and format is None else (format, None)
+        if inferred_format not in ARCHIVE_FORMATS:
+            raise ValueError("Unsupported archive format. Choose from 'zip' or 'tar'.")
+        self.format = inferred_format
+        self.compress = bool(inferred_compress if compress is None else compress)
+        self.path = os.fspath(path) if is_name else None
+        self.index_path = index_path if index_path is not None or not is_name else self.path + INDEX_SUFFIX
+        self.index = {}
+        self._paths = PathClaims()
+        self._mtime = int(time.time())  # Whole seconds: a float would add a PAX header per clip.
+
+        self._file = open(self.path, "wb") if is_name else None
+        self._stream = _BlockWriter(self._file if is_name else path, buffer_size)
+        if self.format == "zip":
+            compression = zipfile.ZIP_DEFLATED if self.compress else zipfile.ZIP_STORED
+            self._archive = zipfile.ZipFile(self._stream, "w", compression=compression)
+        else:
+            self._archive = tarfile.open(fileobj=self._stream, mode="w|gz" if self.compress else "w|", format=tarfile.PAX_FORMAT)
+
+    def write(self, directory, stem, data):
+        path = self._paths.claim(directory, stem)
+        data = bytes(data)
+        if self.format == "zip":
+            info = zipfile.ZipInfo(path, date_time=time.localtime(self._mtime)[:6])
+            info.compress_type = self._archive.compression
+            info.external_attr = 0o644 << 16
+            self._archive.writestr(info, data)
+            # Local header: 30 fixed bytes, then the name and extra field, then the data.
+            offset = info.header_offset + 30 + len(path.encode("utf-8")) + len(info.extra)
+        else:
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mtime = self._mtime
+            info.mode = 0o644
+            self._archive.addfile(info, io.BytesIO(data))
+            # The data ends on the tar offset, padded to the next 512-byte block.
+            offset = self._archive.offset - -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        self.index[path] = (offset, len(data))
+        return path
+
+    def close(self):
+        if self._archive is None:
+            return
+        self._archive.close()
+        self._archive = None
+        self._stream.close()  # Writes out the last block.
+        if self._file is not None:
+            self._file.close()
+        if self.index_path is not None:
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                json.dump({"format": self.format, "compressed": self.compress, "entries": self.index}, f)
+
+
+class ArchiveReader:
+    """
+    Random access to the clips of an archive written by ArchiveSink.
+
+    Uncompressed archives are read with one seek and read per clip, using the index file if
+    present or the archive's own directory otherwise. Compressed archives fall back to
+    zipfile/tarfile.
+
+    Parameters:
+        path (str): Archive file.
+        index_path (str or None): JSON index written by ArchiveSink; defaults to
+            path + ".index.json" when that file exists.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        if index_path is None and os.path.exists(path + INDEX_SUFFIX):
+            index_path = path + INDEX_SUFFIX
+        if index_path is not None:
+            with open(index_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.format = meta["format"]
+            self.compressed = meta["compressed"]
+            self.index = {name: tuple(entry) for name, entry in meta["entries"].items()}
+        else:
+            self.format = "zip" if zipfile.is_zipfile(path) else "tar"
+            self.compressed, self.index = self._scan()
+        self._file = open(path, "rb")
+        self._fallback = None
+
+    def _scan(self):
+        """Builds the offset table from the archive's own directory."""
+        index = {}
+        if self.format == "zip":
+            with zipfile.ZipFile(self.path) as zf, open(self.path, "rb") as f:
+                infos = zf.infolist()
+                compressed = any(info.compress_type != zipfile.ZIP_STORED for info in infos)
+                for info in infos:
+                    f.seek(info.header_offset + 26)
+                    name_length, extra_length = struct.unpack("<HH", f.read(4))
+                    index[info.filename] = (info.header_offset + 30 + name_length + extra_length, info.file_size)
+            return compressed, index
+        with open(self.path, "rb") as f:
+            compressed = f.read(2) == b"\x1f\x8b"  # gzip magic
+        with tarfile.open(self.path) as tf:
+            for member in tf:
+                if member.isfile():
+                    index[member.name] = (member.offset_data, member.size)
+        return compressed, index
+
+    def names(self):
+        """Returns the relative paths of all clips, in archive order."""
+        return list(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def read(self, name):
+        """
+        Returns the bytes of one clip.
+
+        Parameters:
+            name (str): Relative path, e.g. "house/variation_1/kick_house_1.mid".
+
+        Raises:
+            KeyError: If the archive holds no such clip.
+        """
+        offset, length = self.index[name]
+        if not self.compressed:
+            self._file.seek(offset)
+            return self._file.read(length)
+        if self._fallback is None:
+            self._fallback = zipfile.ZipFile(self.path) if self.format == "zip" else tarfile.open(self.path)
+        if self.format == "zip":
+            return self._fallback.read(name)
+        return self._fallback.extractfile(name).read()
+
+    def close(self):
+        self._file.close()
+        if self._fallback is not None:
+            self._fallback.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,62 @@
+"""
+Cold versus cached reruns of a seeded run into the same output folder.
+
+The first run generates every variation and stores it in a GenerationCache; the reruns hit
+the cache. In "link" mode every output file must stay a single hard link to its cache entry,
+so reruns must not add any suffixed (_1, _2, ...) duplicates. In "report" mode a fully cached
+rerun must not create anything in a fresh output folder. The script fails if either check
+does.
+
+Usage:
+    python benchmarks/bench_cache_rerun.py [num_variations] [reruns]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drum_pattern_generator import generate_midi_patterns
+from generation_cache import GenerationCache
+
+SUFFIXED = re.compile(r"_\d+_\d+\.mid$")
+
+
+def output_files(root):
+    return [os.path.join(d, f) for d, _, files in os.walk(root) for f in files]
+
+
+def main(num_variations=200, reruns=4, genre="dnb", seed_base=5):
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = GenerationCache(os.path.join(tmp, "cache"))
+        out = os.path.join(tmp, "out")
+        for run in range(reruns + 1):
+            start = time.perf_counter()
+            generate_midi_patterns(genre, out, num_variations, seed_base=seed_base, cache=cache)
+            print(f"{'cold' if run == 0 else f'rerun {run}':<8} {(time.perf_counter() - start) * 1e3:>8.1f} ms")
+        files = output_files(out)
+        # Stems end in _<variation>, so a claimed duplicate name ends in _<variation>_<n>.
+        duplicates = [f for f in files if SUFFIXED.search(f)]
+        if duplicates:
+            ok = False
+            print(f"FAIL: reruns added {len(duplicates)} suffixed files, e.g. {duplicates[0]}")
+        print(f"link: {len(files)} files, {cache.stats()['hits']} cache hits")
+
+        report = GenerationCache(os.path.join(tmp, "cache"), on_hit="report")
+        out = os.path.join(tmp, "report")
+        generate_midi_patterns(genre, out, num_variations, seed_base=seed_base, cache=report)
+        if os.path.exists(out):
+            ok = False
+            print(f"FAIL: a fully cached 'report' run created {out}")
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+    ))
@@ -0,0 +1,66 @@
+"""
+Cold-start cost of the command line entry point: a fresh interpreter writing one variation.
+
+Each run starts a new process for python -m drum_pattern_generator and times it until the
+process exits with its files on disk. The bare interpreter start (python -c pass) is timed
+the same way and subtracted, which leaves the cost this project adds: importing the module,
+compiling one genre, generating, encoding and writing. The budget applies to that difference.
+
+Usage:
+    python benchmarks/bench_cold_start.py [runs] [budget_ms]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(args, runs):
+    """Returns the median wall time (seconds) of running args in a fresh process."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def deferred_modules():
+    """Returns the heavy or optional modules that importing drum_pattern_generator loaded anyway."""
+    code = (
+        "import sys, drum_pattern_generator; "
+        "print(' '.join(m for m in ('midiutil', 'numpy', 'hashlib', 'datetime', 'argparse') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return out.stdout.split()
+
+
+def main(runs=20, budget_ms=50.0):
+    with tempfile.TemporaryDirectory() as output_dir:
+        cli = [sys.executable, "-m", "drum_pattern_generator", "house", "-n", "1", "-s", "1000", "-q", "-o", output_dir]
+        time_command(cli, 2)  # Warm the OS file cache (and .pyc files, where enabled).
+        baseline = time_command([sys.executable, "-c", "pass"], runs)
+        total = time_command(cli, runs)
+    overhead_ms = (total - baseline) * 1000
+
+    loaded = deferred_modules()
+    print(f"interpreter start:        {baseline * 1000:8.1f} ms")
+    print(f"CLI, one variation:       {total * 1000:8.1f} ms")
+    print(f"added by this project:    {overhead_ms:8.1f} ms (budget {budget_ms:.0f} ms)")
+    print(f"loaded by plain import:   {' '.join(loaded) or '(none of midiutil, numpy, hashlib, datetime, argparse)'}")
+    if overhead_ms > budget_ms or loaded:
+        print("FAIL")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 50.0,
+    ))
@@ -0,0 +1,40 @@
+"""
+Per-variation cost of the aggregated DnB generator (variation_index=None) as num_variations grows.
+
+The Amen fill in bar C used to rebuild the whole kick and snare lists of the run, which made
+aggregated runs quadratic in num_variations. Fills are now applied to one bar's hits, so the
+cost per variation should stay flat from 10 to 100k variations.
+
+Usage:
+    python benchmarks/bench_dnb_fills.py [max_variations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drum_pattern_generator import generate_drum_events_dnb
+
+
+def bench(num_variations, repeats=3, seed_base=1000):
+    """Returns the best wall time (seconds) of generating num_variations aggregated DnB loops."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        generate_drum_events_dnb(num_variations=num_variations, seed_base=seed_base)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(max_variations=100_000):
+    print(f"{'variations':>10}  {'total (s)':>10}  {'per variation (us)':>18}")
+    n = 10
+    while n <= max_variations:
+        elapsed = bench(n, repeats=3 if n <= 10_000 else 1)
+        print(f"{n:>10}  {elapsed:>10.4f}  {elapsed / n * 1e6:>18.2f}")
+        n *= 10
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
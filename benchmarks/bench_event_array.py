@@ -0,0 +1,102 @@
+"""
+Checks the drum_events array path against the dictionary path, then times both humanizers.
+
+For every genre and a range of seeded variations:
+    drum_events.generate_event_array must hold the same hits as generate_drum_events;
+    array_to_events(*events_to_array(d)) must give d back;
+    apply_groove_array must move the same hits as GrooveTemplate.apply, for every built-in
+    groove.
+The timing part generates and humanizes the same number of variations both ways: one
+generate_variation_events call per variation (per-hit draws), against one
+generate_event_array call and one humanize_event_array pass over the whole array (one draw
+per column). The script exits with status 1 on any mismatch, and skips (status 0) when NumPy
+is not installed.
+
+Usage:
+    python benchmarks/bench_event_array.py [num_variations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drum_pattern_generator import (
+    available_genres,
+    available_grooves,
+    generate_drum_events,
+    generate_variation_events,
+    get_groove,
+)
+
+try:
+    import drum_events
+    import numpy as np
+except ImportError as exc:
+    drum_events = None
+    SKIP_REASON = str(exc)
+
+
+def by_tick(events):
+    """Each instrument's hits in tick order, keeping the order of hits on the same tick."""
+    return {inst: sorted(ev_list, key=lambda x: x[0]) for inst, ev_list in events.items()}
+
+
+def hit_sets(events):
+    """Each instrument's hits, fully sorted, for comparisons that do not depend on order."""
+    return {inst: sorted(ev_list) for inst, ev_list in events.items()}
+
+
+def check(genre, num_variations, seed_base=1000):
+    """Returns a list of mismatch descriptions for one genre (empty if the paths agree)."""
+    errors = []
+    events = generate_drum_events(genre, num_variations=num_variations, seed_base=seed_base)
+    arr = drum_events.generate_event_array(genre, num_variations, seed_base)
+    if drum_events.array_to_events(arr) != by_tick(events):
+        errors.append(f"{genre}: generate_event_array differs from generate_drum_events")
+    if drum_events.array_to_events(*drum_events.events_to_array(events)) != events:
+        errors.append(f"{genre}: events_to_array / array_to_events round trip differs")
+    for name in available_grooves():
+        grooved = {inst: list(ev_list) for inst, ev_list in events.items()}
+        get_groove(name).apply(grooved)
+        batched = drum_events.apply_groove_array(arr.copy(), name)
+        if hit_sets(drum_events.array_to_events(batched)) != hit_sets(grooved):
+            errors.append(f"{genre}: apply_groove_array differs from GrooveTemplate.apply for groove {name!r}")
+    return errors
+
+
+def bench_dict(genre, num_variations, seed_base=1000):
+    """Returns the wall time (seconds) of generating and humanizing variations one at a time."""
+    start = time.perf_counter()
+    for var in range(1, num_variations + 1):
+        generate_variation_events(genre, var, seed_base=seed_base)
+    return time.perf_counter() - start
+
+
+def bench_array(genre, num_variations, seed_base=1000):
+    """Returns the wall time (seconds) of generating and humanizing all variations as one array."""
+    start = time.perf_counter()
+    arr = drum_events.generate_event_array(genre, num_variations, seed_base)
+    drum_events.humanize_event_array(arr, 15, 0.02, rng=np.random.default_rng(seed_base))
+    return time.perf_counter() - start
+
+
+def main(num_variations=500):
+    if drum_events is None:
+        print(f"SKIP: {SKIP_REASON}")
+        return 0
+    errors = []
+    print(f"{'genre':<8} {'dict us/var':>12} {'array us/var':>13}")
+    for genre in available_genres():
+        errors += check(genre, num_variations)
+        per_dict = bench_dict(genre, num_variations) / num_variations
+        per_array = bench_array(genre, num_variations) / num_variations
+        print(f"{genre:<8} {per_dict * 1e6:>12.1f} {per_array * 1e6:>13.1f}")
+    for error in errors:
+        print(f"FAIL: {error}")
+    print("OK" if not errors else f"{len(errors)} mismatches")
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
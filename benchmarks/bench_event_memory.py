@@ -0,0 +1,51 @@
+"""
+Memory held by an aggregated run (variation_index=None) as tuple lists versus an EventStore.
+
+For each genre, generate_drum_events builds num_variations back-to-back loops twice: once as
+the usual dictionary of (tick, velocity) tuple lists and once with compact=True. tracemalloc
+measures what each result keeps allocated. The script fails unless every genre shrinks by at
+least the required factor.
+
+Usage:
+    python benchmarks/bench_event_memory.py [num_variations] [min_ratio]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drum_pattern_generator import available_genres, generate_drum_events
+
+
+def retained_bytes(genre, num_variations, compact, seed_base=1000):
+    """Returns (bytes still allocated by the result, hit count) of one aggregated run."""
+    generate_drum_events(genre, num_variations=1, seed_base=seed_base)  # Compile outside the trace.
+    gc.collect()
+    tracemalloc.start()
+    events = generate_drum_events(genre, num_variations=num_variations, seed_base=seed_base, compact=compact)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, sum(len(ev_list) for ev_list in events.values())
+
+
+def main(num_variations=10_000, min_ratio=5.0):
+    print(f"{'genre':<8} {'hits':>10} {'lists MB':>10} {'store MB':>10} {'lists B/hit':>11} {'store B/hit':>11} {'ratio':>7}")
+    ok = True
+    for genre in available_genres():
+        lists, hits = retained_bytes(genre, num_variations, compact=False)
+        store, _ = retained_bytes(genre, num_variations, compact=True)
+        ratio = lists / store
+        ok &= ratio >= min_ratio
+        print(f"{genre:<8} {hits:>10} {lists / 1e6:>10.2f} {store / 1e6:>10.2f} {lists / hits:>11.1f} {store / hits:>11.1f} {ratio:>6.1f}x")
+    print("OK" if ok else f"FAIL: less than {min_ratio:.0f}x smaller")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5.0,
+    ))
@@ -0,0 +1,45 @@
+"""
+Cost per candidate of variation_search versus the full generate-humanize-encode-write pipeline.
+
+The search only draws each candidate's choice vector; the pipeline is what every winner (and,
+without the search, every audition) goes through. The scan runs with stop_when_complete=False
+so every candidate is drawn. The script fails unless scanning is at least the required factor
+cheaper per variation than writing.
+
+Usage:
+    python benchmarks/bench_search.py [num_candidates] [min_ratio]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drum_pattern_generator import available_genres, generate_midi_patterns
+from variation_search import search_variations
+
+
+def main(num_candidates=200_000, min_ratio=20.0, written=200):
+    print(f"{'genre':<8} {'scan us/cand':>12} {'write us/var':>12} {'ratio':>7}")
+    ok = True
+    for genre in available_genres():
+        start = time.perf_counter()
+        search_variations(genre, num_candidates, top_k=10, stop_when_complete=False)
+        scan = (time.perf_counter() - start) / num_candidates
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            generate_midi_patterns(genre, tmp, num_variations=written, seed_base=0)
+            write = (time.perf_counter() - start) / written
+        ratio = write / scan
+        ok &= ratio >= min_ratio
+        print(f"{genre:<8} {scan * 1e6:>12.2f} {write * 1e6:>12.1f} {ratio:>6.1f}x")
+    print("OK" if ok else f"FAIL: scanning is less than {min_ratio:.0f}x cheaper than writing")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20.0,
+    ))
@@ -0,0 +1,73 @@
+"""
+Request latency of the resident generation server under concurrent load.
+
+Starts a GenerationServer in this process, opens a number of keep-alive client connections
+and has each send /generate requests back to back. Client-side p50/p99 latencies are
+printed next to the server's own /stats figures.
+
+Usage:
+    python benchmarks/bench_server.py [requests] [concurrency] [workers]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generation_server import GenerationServer, LatencyRecorder
+
+
+async def request(reader, writer, target):
+    """Sends one GET over an open connection and returns (status, body)."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("iso-8859-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length:"))
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, targets, recorder):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for target in targets:
+            start = time.perf_counter()
+            status, body = await request(reader, writer, target)
+            recorder.record(time.perf_counter() - start, ok=status == 200 and body[:4] == b"MThd")
+    finally:
+        writer.close()
+
+
+async def run(num_requests=2000, concurrency=16, workers=None):
+    server = GenerationServer(workers=workers)
+    await server.start(port=0)
+    host, port = server.address[:2]
+    genres = ("house", "ukg", "dnb", "breaks")
+    targets = [
+        f"/generate?genre={genres[i % len(genres)]}&variation={i + 1}&seed=1000"
+        for i in range(num_requests)
+    ]
+    recorder = LatencyRecorder(window=num_requests)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, targets[c::concurrency], recorder) for c in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await request(reader, writer, "/stats")
+    writer.close()
+    await server.close()
+
+    print(f"{num_requests} requests, concurrency {concurrency}, {server.workers} worker(s): {num_requests / elapsed:.0f} req/s")
+    print(f"client: {recorder.summary()}")
+    print(f"server: {json.loads(stats)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 16,
+        int(sys.argv[3]) if len(sys.argv) > 3 else None,
+    ))
@@ -0,0 +1,89 @@
+"""
+Checks that the direct smf writer produces the same bytes as the midiutil fallback.
+
+Random hit lists are built to hit the cases where the writers could disagree: hits closer
+together than the note length (overlapping notes), several hits on the same tick with
+different velocities (duplicates), unsorted lists, empty instruments and random tempos. Each
+case is encoded per instrument (encode_midi_files) and as one multi-track file
+(encode_multitrack_midi_file) with both writers. The script exits with status 1 on the first
+few mismatches, and skips (status 0) when midiutil is not installed.
+
+Usage:
+    python benchmarks/compare_writers.py [num_cases] [seed]
+"""
+import importlib.util
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drum_pattern_generator import (
+    INSTRUMENTS,
+    NOTE_DURATION_TICKS,
+    TICKS_PER_VARIATION,
+    encode_midi_files,
+    encode_multitrack_midi_file,
+)
+
+
+def random_hits(rng):
+    """Returns an unsorted hit list with overlapping notes and same-tick duplicates."""
+    hits = []
+    for _ in range(rng.randint(0, 40)):
+        tick = rng.randrange(TICKS_PER_VARIATION)
+        hits.append((tick, rng.randint(1, 127)))
+        roll = rng.random()
+        if roll < 0.25:
+            # Duplicate start, usually with another velocity.
+            hits.append((tick, rng.randint(1, 127)))
+        elif roll < 0.5:
+            # Starts while the previous note is still sounding.
+            hits.append((tick + rng.randint(1, NOTE_DURATION_TICKS), rng.randint(1, 127)))
+    rng.shuffle(hits)
+    return hits
+
+
+def random_events(rng):
+    return {inst: random_hits(rng) for inst in INSTRUMENTS}
+
+
+def copy_events(events):
+    # The encoders sort the lists in place; give each writer its own copy.
+    return {inst: list(ev_list) for inst, ev_list in events.items()}
+
+
+def compare(events, tempo):
+    """Returns the names of the outputs whose bytes differ between the two writers."""
+    smf = encode_midi_files(copy_events(events), tempo=tempo, writer="smf")
+    reference = encode_midi_files(copy_events(events), tempo=tempo, writer="midiutil")
+    differ = [inst for inst in reference if smf.get(inst) != reference[inst]]
+    if encode_multitrack_midi_file(copy_events(events), tempo=tempo, writer="smf") != \
+            encode_multitrack_midi_file(copy_events(events), tempo=tempo, writer="midiutil"):
+        differ.append("multitrack")
+    return differ
+
+
+def main(num_cases=2000, seed=0):
+    if importlib.util.find_spec("midiutil") is None:
+        print("SKIP: midiutil is not installed (pip install midiutil)")
+        return 0
+    rng = random.Random(seed)
+    failures = 0
+    for case in range(num_cases):
+        events = random_events(rng)
+        tempo = rng.choice((rng.uniform(40, 250), float(rng.randint(60, 180))))
+        differ = compare(events, tempo)
+        if differ:
+            failures += 1
+            if failures <= 5:
+                print(f"FAIL: case {case} (seed {seed}, tempo {tempo}): {', '.join(differ)} differ")
+    print(f"{num_cases - failures}/{num_cases} cases byte-identical")
+    return 0 if failures == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 0,
+    ))
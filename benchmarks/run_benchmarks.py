@@ -0,0 +1,334 @@
+"""
+Benchmark harness: per-stage micro-benchmarks and end-to-end runs, with JSON results that can
+be compared between commits.
+
+Stages are timed separately for every genre, each over a fixed batch of seeded variations:
+    generate    generate_drum_events for one variation (pattern choices and template rendering)
+    humanize    humanize_instrument_events on a fresh copy of the events
+    encode      encode_midi_files with the direct smf writer
+    midiutil    build_midi_files + midi_file_bytes (the midiutil fallback; skipped when
+                midiutil is not installed)
+    multitrack  encode_multitrack_midi_file (per_variation / per_genre layouts)
+    write       writing the encoded files through a DirectorySink (mkdir, names, write)
+End-to-end runs call generate_midi_patterns for each genre at each size, into a temporary
+directory (or a MemorySink / zip archive with --sink).
+
+Every result is reported as the median and best of all its timed calls, as time per unit (per
+variation) so runs of different sizes can be compared. Like timeit's autorange, each of the
+--repeats repeats calls the measured function until at least --min-time seconds have been
+spent in it, so fast stages are timed over many calls rather than one. Repeats are
+interleaved across results (see measure_all), so a slow spell of the machine, which can last
+tens of seconds, does not fall on all repeats of one result.
+
+With --compare, each result is checked against the same result in an earlier JSON file. The
+check uses the fastest call: on a shared machine most calls are slowed by other load, so the
+mean of a repeat moves by 50% between back-to-back runs, while the fastest call stays within
+about 10%. The script exits with status 1 when any gated result's best
+per-unit time grew by more than --threshold (0.25 = 25%). Results that are too noisy for
+that threshold are still reported but not gated: filesystem-bound ones (the write stage,
+directory and zip end-to-end runs), end-to-end runs of fewer than MIN_GATED_UNITS variations
+and results of fewer than MIN_GATED_CALLS calls. --noisy-threshold gates them at a threshold
+of their own.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --quick --compare bench.json
+    python benchmarks/run_benchmarks.py --quick --compare bench.json --noisy-threshold 1.0
+    python benchmarks/run_benchmarks.py --sizes 1,100,10000,100000 --sink memory
+"""
+import argparse
+import copy
+import gc
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from drum_pattern_generator import (
+    DirectorySink,
+    MemorySink,
+    available_genres,
+    build_midi_files,
+    encode_midi_files,
+    encode_multitrack_midi_file,
+    generate_drum_events,
+    generate_midi_patterns,
+    humanize_instrument_events,
+    make_rng,
+    midi_file_bytes,
+)
+
+SEED_BASE = 1000
+DEFAULT_SIZES = (1, 100, 10_000, 100_000)
+QUICK_SIZES = (1, 100, 1_000)
+# midiutil is an optional fallback writer; its stage only runs where it is installed.
+HAVE_MIDIUTIL = importlib.util.find_spec("midiutil") is not None
+# Seconds each repeat keeps calling the measured function for.
+DEFAULT_MIN_TIME = 0.2
+# Results below these sizes are too noisy for --threshold; see the module docstring.
+MIN_GATED_UNITS = 100
+MIN_GATED_CALLS = 3
+
+
+def measure(func, setup=None, min_time=DEFAULT_MIN_TIME):
+    """
+    Returns the wall time (seconds) of every call of func(setup()) in one repeat.
+
+    The repeat calls func until min_time seconds have been spent in it; setup is called
+    before every call and is not timed. As in timeit, the garbage collector is off meanwhile,
+    so a collection does not land on some calls and not others.
+    """
+    times = []
+    total = 0.0
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while not times or total < min_time:
+            arg = setup() if setup is not None else None
+            start = time.perf_counter()
+            func(arg)
+            times.append(time.perf_counter() - start)
+            total += times[-1]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return times
+
+
+def case(name, units, func, setup=None, repeats=1, gated=True):
+    """Describes one result for measure_all: func(setup()) does units units of work."""
+    return {"name": name, "units": units, "func": func, "setup": setup, "repeats": repeats, "gated": gated}
+
+
+def measure_all(cases, min_time=DEFAULT_MIN_TIME, verbose=True):
+    """
+    Measures every case and returns their results, in order.
+
+    Repeats are interleaved: round r runs repeat r of every case that has one, so each
+    result's repeats are spread over the whole run instead of over a few seconds of it, and
+    a slow spell on the machine costs every result one repeat rather than one result all of
+    them. Each case gets one untimed warm-up call before its first repeat.
+    """
+    times = {c["name"]: [] for c in cases}
+    rounds = max((c["repeats"] for c in cases), default=0)
+    for r in range(rounds):
+        if verbose:
+            print(f"round {r + 1}/{rounds}", file=sys.stderr)
+        for c in cases:
+            if r >= c["repeats"]:
+                continue
+            if r == 0:
+                c["func"](c["setup"]() if c["setup"] is not None else None)
+            times[c["name"]] += measure(c["func"], c["setup"], min_time)
+    return [result(c["name"], c["units"], times[c["name"]], c["gated"]) for c in cases]
+
+
+def result(name, units, times, gated=True):
+    median = statistics.median(times)
+    return {
+        "name": name,
+        "units": units,
+        "calls": len(times),
+        "median_s": median,
+        "best_s": min(times),
+        "per_unit_us": median / units * 1e6,
+        "best_per_unit_us": min(times) / units * 1e6,
+        "gated": gated and len(times) >= MIN_GATED_CALLS,
+    }
+
+
+# --- Stages ---
+def stage_cases(genre, batch, repeats, workdir):
+    """Returns the cases timing each pipeline stage over batch seeded variations of one genre."""
+    variations = range(1, batch + 1)
+    events = [generate_drum_events(genre, variation_index=v, rng=make_rng(SEED_BASE, v)) for v in variations]
+    humanized = copy.deepcopy(events)
+    for v, ev in zip(variations, humanized):
+        humanize_instrument_events(ev, 15, 0.02, rng=make_rng(SEED_BASE, v))
+    payloads = [encode_midi_files(ev) for ev in humanized]
+
+    def generate(_):
+        for v in variations:
+            generate_drum_events(genre, variation_index=v, rng=make_rng(SEED_BASE, v))
+
+    def humanize(copies):
+        for v, ev in zip(variations, copies):
+            humanize_instrument_events(ev, 15, 0.02, rng=make_rng(SEED_BASE, v))
+
+    def encode(copies):
+        for ev in copies:
+            encode_midi_files(ev)
+
+    def midiutil(copies):
+        for ev in copies:
+            for midi in build_midi_files(ev).values():
+                midi_file_bytes(midi)
+
+    def multitrack(copies):
+        for ev in copies:
+            encode_multitrack_midi_file(ev)
+
+    def write(target):
+        sink = DirectorySink(target)
+        for v, files in zip(variations, payloads):
+            for inst, data in files.items():
+                sink.write(f"{genre}/variation_{v}", f"{inst}_{genre}_{v}", data)
+
+    def fresh_events():
+        return copy.deepcopy(events)
+
+    def fresh_humanized():
+        return copy.deepcopy(humanized)
+
+    def fresh_dir():
+        target = os.path.join(workdir, "write")
+        shutil.rmtree(target, ignore_errors=True)
+        return target
+
+    cases = [
+        case(f"stage/{genre}/generate", batch, generate, None, repeats),
+        case(f"stage/{genre}/humanize", batch, humanize, fresh_events, repeats),
+        case(f"stage/{genre}/encode", batch, encode, fresh_humanized, repeats),
+    ]
+    if HAVE_MIDIUTIL:
+        cases.append(case(f"stage/{genre}/midiutil", batch, midiutil, fresh_humanized, repeats))
+    cases += [
+        case(f"stage/{genre}/multitrack", batch, multitrack, fresh_humanized, repeats),
+        # Filesystem-bound: reported, but not gated by --threshold.
+        case(f"stage/{genre}/write", batch, write, fresh_dir, repeats, gated=False),
+    ]
+    return cases
+
+
+# --- End to End ---
+def end_to_end_case(genre, size, repeats, workdir, sink_kind):
+    """Returns the case timing generate_midi_patterns for size variations of one genre."""
+    # Shared by every end-to-end case; setup clears it, so only one run's output is on disk.
+    target = os.path.join(workdir, "e2e")
+
+    def setup():
+        shutil.rmtree(target, ignore_errors=True)
+        if sink_kind == "memory":
+            return MemorySink()
+        if sink_kind == "zip":
+            from archive_sink import ArchiveSink
+            os.makedirs(target, exist_ok=True)
+            return ArchiveSink(os.path.join(target, "library.zip"))
+        return None
+
+    def run(sink):
+        generate_midi_patterns(genre, target, num_variations=size, seed_base=SEED_BASE, sink=sink)
+        if sink is not None:
+            sink.close()
+
+    gated = sink_kind == "memory" and size >= MIN_GATED_UNITS
+    return case(f"e2e/{sink_kind}/{genre}/{size}", size, run, setup, repeats, gated)
+
+
+# --- Reporting ---
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results, baseline, threshold, noisy_threshold=None):
+    """
+    Prints per-result changes against a baseline and returns the names of regressions.
+
+    Gated results fail past threshold; the others only past noisy_threshold, or never if it
+    is None.
+    """
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'result (best us/variation)':<36} {'baseline':>12} {'now':>12} {'change':>8}")
+    for r in results:
+        old = previous.get(r["name"])
+        if old is None:
+            continue
+        change = r["best_per_unit_us"] / old["best_per_unit_us"] - 1.0
+        limit = threshold if r.get("gated", True) else noisy_threshold
+        flag = "" if limit is not None else "  (not gated)"
+        if limit is not None and change > limit:
+            regressions.append(r["name"])
+            flag = "  REGRESSION"
+        print(f"{r['name']:<36} {old['best_per_unit_us']:>12.2f} {r['best_per_unit_us']:>12.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the drum pattern generator.")
+    parser.add_argument("--genres", default=None, help="Comma-separated genres (default: all registered).")
+    parser.add_argument("--sizes", default=None, help="Comma-separated end-to-end sizes (default: 1,100,10000,100000).")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes and batches, for a fast check.")
+    parser.add_argument("--batch", type=int, default=None, help="Variations per stage micro-benchmark (default: 500, quick: 100).")
+    parser.add_argument("--repeats", type=int, default=7, help="Repeats per result (default: 7).")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help=f"Seconds each repeat runs for at least (default: {DEFAULT_MIN_TIME}).")
+    parser.add_argument("--sink", choices=("directory", "memory", "zip"), default="directory", help="End-to-end output (default: directory).")
+    parser.add_argument("--skip-e2e", action="store_true", help="Only run the stage micro-benchmarks.")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file.")
+    parser.add_argument("--compare", default=None, help="Baseline JSON results to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed per-unit slowdown before failing (default: 0.25).")
+    parser.add_argument("--noisy-threshold", type=float, default=None, help="Allowed slowdown of filesystem-bound, small and few-repeat results (default: not gated).")
+    args = parser.parse_args(argv)
+
+    genres = args.genres.split(",") if args.genres else available_genres()
+    if args.sizes:
+        sizes = [int(n) for n in args.sizes.split(",")]
+    else:
+        sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    batch = args.batch or (100 if args.quick else 500)
+
+    if not HAVE_MIDIUTIL:
+        print("midiutil is not installed; skipping the midiutil stage.")
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = []
+        for genre in genres:
+            cases += stage_cases(genre, batch, args.repeats, workdir)
+        if not args.skip_e2e:
+            for genre in genres:
+                for size in sizes:
+                    # Large runs are repeated less: 10k runs just enough to be gated, 100k once.
+                    repeats = args.repeats if size < 10_000 else MIN_GATED_CALLS if size < 100_000 else 1
+                    cases.append(end_to_end_case(genre, size, repeats, workdir, args.sink))
+        results = measure_all(cases, args.min_time)
+    for r in results:
+        line = f"{r['name']:<36} {r['per_unit_us']:>10.2f} us/variation"
+        print(line if r["name"].startswith("stage/") else f"{line}  ({r['median_s']:.3f} s)")
+
+    report = {"environment": environment(), "batch": batch, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold, args.noisy_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} result(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print(f"\nNo result regressed by more than {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
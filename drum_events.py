@@ -0,0 +1,397 @@
+"""
+Vectorized NumPy event core for the drum pattern generator.
+
+Events are held in one structured array with columns (instrument id, tick, velocity, duration)
+instead of a dict of per-instrument (tick, velocity) tuple lists, so that bar tiling,
+humanization, sorting and filtering run as whole-array operations. events_to_array and
+array_to_events convert to and from the dict format used by drum_pattern_generator (see
+events_to_array for what round-trips exactly). Ticks and durations are integers at
+TICKS_PER_BEAT, like the dict events.
+
+Requires numpy (pip install numpy), an optional dependency: drum_pattern_generator works
+without it.
+"""
+try:
+    import numpy as np
+except ImportError as exc:  # Optional dependency; say which feature needs it.
+    raise ImportError("drum_events needs NumPy: pip install numpy") from exc
+
+# Instrument ids are positions in INSTRUMENTS.
+from drum_pattern_generator import (
+    DEFAULT_GM_MAPPING,
+    INSTRUMENTS,
+    NOTE_DURATION_TICKS,
+    TICKS_PER_BAR,
+    TICKS_PER_BEAT,
+    TICKS_PER_VARIATION,
+    EventColumn,
+    get_genre,
+    get_groove,
+    make_rng,
+)
+
+EVENT_DTYPE = np.dtype([
+    ("instrument", np.uint8),
+    ("tick", np.int64),
+    ("velocity", np.uint8),
+    ("duration", np.int32),
+])
+
+DEFAULT_DURATION = NOTE_DURATION_TICKS
+
+
+def _instrument_names(events_dict, instruments):
+    """Returns the instrument name tuple used for ids: instruments plus any extra keys in the dict."""
+    names = list(instruments)
+    for name in events_dict:
+        if name not in names:
+            names.append(name)
+    return tuple(names)
+
+
+# --- Conversion ---
+def events_to_array(events_dict, instruments=INSTRUMENTS, duration=DEFAULT_DURATION):
+    """
+    Converts an events dictionary into a structured event array.
+
+    Events keep their per-instrument order, so array_to_events(*events_to_array(d)) == d for
+    a dict of lists that has every name in instruments, like the ones the generators return.
+    Names missing from d come back as empty lists; extra names are kept, since they are in
+    the returned names.
+
+    Parameters:
+        events_dict (dict): Dictionary (or EventStore) mapping instrument names to lists of (tick, velocity) tuples.
+        instruments (tuple): Instrument names whose positions are used as ids. Names in the
+            dict that are not listed are appended in dict order.
+        duration (int): Note duration (in ticks) stored for every event.
+
+    Returns:
+        tuple: (array, names) where array has dtype EVENT_DTYPE and names is the instrument
+               name tuple that the instrument column indexes into.
+    """
+    names = _instrument_names(events_dict, instruments)
+    total = sum(len(ev_list) for ev_list in events_dict.values())
+    arr = np.empty(total, dtype=EVENT_DTYPE)
+    pos = 0
+    for name, ev_list in events_dict.items():
+        n = len(ev_list)
+        if n == 0:
+            continue
+        chunk = arr[pos:pos + n]
+        chunk["instrument"] = names.index(name)
+        if isinstance(ev_list, EventColumn):
+            # Packed columns (EventStore) are copied straight from their buffers.
+            chunk["tick"] = np.frombuffer(ev_list.ticks, dtype=np.dtype(ev_list.ticks.typecode))
+            chunk["velocity"] = np.frombuffer(ev_list.velocities, dtype=np.uint8)
+        else:
+            pairs = np.asarray(ev_list, dtype=np.int64).reshape(n, 2)
+            chunk["tick"] = pairs[:, 0]
+            chunk["velocity"] = pairs[:, 1]
+        chunk["duration"] = duration
+        pos += n
+    return arr, names
+
+
+def array_to_events(arr, instruments=INSTRUMENTS):
+    """
+    Converts a structured event array back into an events dictionary.
+
+    Parameters:
+        arr (numpy.ndarray): Array with dtype EVENT_DTYPE.
+        instruments (tuple): Instrument name tuple that the instrument column indexes into;
+            pass the names returned by events_to_array when the dict had extra instruments.
+
+    Returns:
+        dict: Dictionary mapping every instrument name (even those without events) to a list
+              of (tick, velocity) tuples, in array order.
+    """
+    events = {}
+    ids = arr["instrument"]
+    for inst_id, name in enumerate(instruments):
+        sel = arr[ids == inst_id]
+        events[name] = list(zip(sel["tick"].tolist(), sel["velocity"].tolist()))
+    return events
+
+
+# --- Vectorized Operations ---
+def make_bar(hits, instruments=INSTRUMENTS, duration=DEFAULT_DURATION):
+    """
+    Builds a one-bar event array from (instrument name, tick, velocity) triples.
+
+    Parameters:
+        hits (iterable): (instrument name, tick, velocity) triples with ticks relative to the bar start.
+        instruments (tuple): Instrument name tuple used to assign ids.
+        duration (int): Note duration (in ticks).
+
+    Returns:
+        numpy.ndarray: Array with dtype EVENT_DTYPE.
+    """
+    hits = list(hits)
+    arr = np.empty(len(hits), dtype=EVENT_DTYPE)
+    if hits:
+        names, ticks, vels = zip(*hits)
+        arr["instrument"] = [instruments.index(n) for n in names]
+        arr["tick"] = ticks
+        arr["velocity"] = vels
+        arr["duration"] = duration
+    return arr
+
+
+def tile_bar(bar, offsets):
+    """
+    Stamps a bar template at each offset in one operation.
+
+    Parameters:
+        bar (numpy.ndarray): Array with dtype EVENT_DTYPE, ticks relative to the bar start.
+        offsets (array-like): Start tick of each copy.
+
+    Returns:
+        numpy.ndarray: len(offsets) * len(bar) events, grouped by offset.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    out = np.tile(bar, len(offsets))
+    out["tick"] += np.repeat(offsets, len(bar))
+    return out
+
+
+_groove_tables = {}
+
+
+def _groove_table(groove):
+    """Returns the cached (tick offsets, velocity offsets or None) arrays of a groove template."""
+    tables = _groove_tables.get(groove)
+    if tables is None:
+        dv = groove.velocity_offsets
+        tables = _groove_tables[groove] = (
+            np.asarray(groove.tick_offsets, dtype=np.int64),
+            None if dv is None else np.asarray(dv, dtype=np.int16),
+        )
+    return tables
+
+
+def apply_groove_array(arr, groove, names=INSTRUMENTS):
+    """
+    Applies a groove template to every event in one pass, in place.
+
+    The array counterpart of GrooveTemplate.apply, with the same results: each event takes the
+    offsets of its position in the bar, velocities are clipped to 1-127 and ticks to >= 0.
+
+    Parameters:
+        arr (numpy.ndarray): Array with dtype EVENT_DTYPE.
+        groove (GrooveTemplate or str): Groove template, or a name for get_groove.
+        names (tuple): Instrument name tuple that the instrument column indexes into.
+
+    Returns:
+        numpy.ndarray: arr, for chaining. Use sort_event_array for per-instrument tick order.
+    """
+    groove = get_groove(groove)
+    dt, dv = _groove_table(groove)
+    if groove.instruments is None:
+        sel = slice(None)
+    else:
+        ids = [names.index(n) for n in groove.instruments if n in names]
+        sel = np.isin(arr["instrument"], ids)
+    ticks = arr["tick"][sel]
+    pos = ticks % TICKS_PER_BAR
+    arr["tick"][sel] = np.maximum(ticks + dt[pos], 0)
+    if dv is not None:
+        arr["velocity"][sel] = np.clip(arr["velocity"][sel].astype(np.int16) + dv[pos], 1, 127)
+    return arr
+
+
+def humanize_event_array(arr, velocity_variation=0, timing_variation=0.0, rng=None, groove=None, names=INSTRUMENTS):
+    """
+    Applies in-place random velocity and timing offsets to every event with batched draws.
+
+    This is the array counterpart of humanize_instrument_events. Offsets are drawn from a
+    numpy Generator, so the values differ from the dict-based humanizer for the same seed.
+    Timing offsets are drawn directly as whole ticks, and hits never move before tick 0.
+
+    Parameters:
+        arr (numpy.ndarray): Array with dtype EVENT_DTYPE.
+        velocity_variation (int): Maximum variation to add/subtract from velocity.
+        timing_variation (float): Maximum variation (in beats) to add/subtract from the event time.
+        rng (numpy.random.Generator or None): Generator to draw offsets from. If None, a
+            fresh unseeded generator is used.
+        groove (GrooveTemplate, str or None): Groove applied (with apply_groove_array) before
+            the random offsets.
+        names (tuple): Instrument name tuple that the instrument column indexes into.
+
+    Returns:
+        numpy.ndarray: arr, for chaining.
+    """
+    if groove is not None:
+        apply_groove_array(arr, groove, names)
+    if rng is None:
+        rng = np.random.default_rng()
+    n = len(arr)
+    if velocity_variation > 0:
+        delta_vel = rng.integers(-velocity_variation, velocity_variation + 1, size=n)
+        arr["velocity"] = np.clip(arr["velocity"].astype(np.int16) + delta_vel, 1, 127)
+    max_ticks = int(timing_variation * TICKS_PER_BEAT)
+    if max_ticks > 0:
+        delta_ticks = rng.integers(-max_ticks, max_ticks + 1, size=n)
+        arr["tick"] = np.maximum(arr["tick"] + delta_ticks, 0)
+    return arr
+
+
+def sort_event_array(arr):
+    """
+    Returns the events ordered by instrument, then tick (stable for equal ticks).
+
+    Parameters:
+        arr (numpy.ndarray): Array with dtype EVENT_DTYPE.
+
+    Returns:
+        numpy.ndarray: Sorted copy of arr.
+    """
+    order = np.lexsort((arr["tick"], arr["instrument"]))
+    return arr[order]
+
+
+def filter_event_array(arr, instruments=None, start=None, end=None, names=INSTRUMENTS):
+    """
+    Selects events by instrument and/or tick window.
+
+    Parameters:
+        arr (numpy.ndarray): Array with dtype EVENT_DTYPE.
+        instruments (iterable or None): Instrument names to keep; if None, all are kept.
+        start (int or None): Keep events with tick >= start.
+        end (int or None): Keep events with tick < end.
+        names (tuple): Instrument name tuple that the instrument column indexes into.
+
+    Returns:
+        numpy.ndarray: The selected events, in array order.
+    """
+    mask = np.ones(len(arr), dtype=bool)
+    if instruments is not None:
+        ids = [names.index(n) for n in instruments]
+        mask &= np.isin(arr["instrument"], ids)
+    if start is not None:
+        mask &= arr["tick"] >= start
+    if end is not None:
+        mask &= arr["tick"] < end
+    return arr[mask]
+
+
+# --- Template Rendering ---
+_template_arrays = {}
+
+
+def template_array(pattern, choices, duration=DEFAULT_DURATION):
+    """
+    Returns the cached event array of one variation of a compiled pattern, at offset 0.
+
+    Parameters:
+        pattern (CompiledPattern): Compiled pattern, e.g. get_genre("house").
+        choices (tuple): Choice vector, as returned by pattern.choose().
+        duration (int): Note duration (in ticks).
+
+    Returns:
+        numpy.ndarray: Read-only array with dtype EVENT_DTYPE.
+    """
+    key = (pattern, tuple(choices), duration)
+    arr = _template_arrays.get(key)
+    if arr is None:
+        hits = [
+            (inst, bar_offset + t, vel)
+            for inst, bars in pattern.template(choices).items()
+            for bar_offset, bar_hits in bars
+            for t, vel in bar_hits
+        ]
+        arr = make_bar(hits, duration=duration)
+        arr.flags.writeable = False
+        _template_arrays[key] = arr
+    return arr
+
+
+def render_variations_array(pattern, choice_vectors, offsets, duration=DEFAULT_DURATION):
+    """
+    Renders many variations by tiling each distinct template at the offsets that use it.
+
+    The work is one tile per distinct choice vector, so the cost of N variations is a few
+    array operations regardless of how many hits each template has.
+
+    Parameters:
+        pattern (CompiledPattern): Compiled pattern.
+        choice_vectors (list): One choice vector per variation.
+        offsets (array-like): Start tick of each variation.
+        duration (int): Note duration (in ticks).
+
+    Returns:
+        numpy.ndarray: Events of all variations, grouped by choice vector. Use
+                       sort_event_array for per-instrument tick order.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    groups = {}
+    for i, choices in enumerate(choice_vectors):
+        groups.setdefault(tuple(choices), []).append(i)
+    parts = [
+        tile_bar(template_array(pattern, choices, duration), offsets[idx])
+        for choices, idx in groups.items()
+    ]
+    if not parts:
+        return np.empty(0, dtype=EVENT_DTYPE)
+    return np.concatenate(parts)
+
+
+def generate_event_array(genre, num_variations=5, seed_base=None, duration=DEFAULT_DURATION):
+    """
+    Array counterpart of the generate_drum_events_* functions for all variations at once.
+
+    Choice vectors are drawn exactly as the dict generators draw them, so the result holds
+    the same (un-humanized) events as generate_drum_events_<genre>(num_variations, seed_base).
+
+    Parameters:
+        genre (str): A registered genre, e.g. "house", "ukg", "dnb" or "breaks".
+        num_variations (int): Number of 4-bar ABAC loops to generate.
+        seed_base (int or None): If provided, fixes the random seed for reproducibility.
+        duration (int): Note duration (in ticks).
+
+    Returns:
+        numpy.ndarray: Events sorted by instrument, then tick.
+    """
+    pattern = get_genre(genre)
+    indices = range(1, num_variations + 1)
+    choice_vectors = [pattern.choose(make_rng(seed_base, i)) for i in indices]
+    offsets = [(i - 1) * TICKS_PER_VARIATION for i in indices]
+    return sort_event_array(render_variations_array(pattern, choice_vectors, offsets, duration))
+
+
+# --- MIDI Building ---
+def build_midi_files_from_array(arr, tempo=120.0, gm_mapping=None, names=INSTRUMENTS):
+    """
+    Converts a structured event array into a dictionary of MIDIFile objects (one per instrument).
+
+    Sorting is done once for the whole array instead of once per instrument list.
+
+    Parameters:
+        arr (numpy.ndarray): Array with dtype EVENT_DTYPE.
+        tempo (float): Tempo (BPM) for the MIDI file.
+        gm_mapping (dict or None): Mapping of instrument names to General MIDI note numbers.
+            If None, DEFAULT_GM_MAPPING is used (as in build_midi_files).
+        names (tuple): Instrument name tuple that the instrument column indexes into.
+
+    Returns:
+        dict: Mapping from instrument names to MIDIFile objects.
+    """
+    from midiutil import MIDIFile
+
+    if gm_mapping is None:
+        gm_mapping = DEFAULT_GM_MAPPING
+
+    arr = sort_event_array(arr)
+    ids = arr["instrument"]
+    bounds = np.searchsorted(ids, np.arange(len(names) + 1))
+    midi_files = {}
+    for inst_id, name in enumerate(names):
+        if name not in gm_mapping:
+            continue
+        note = gm_mapping[name]
+        sel = arr[bounds[inst_id]:bounds[inst_id + 1]]
+        midi = MIDIFile(1, ticks_per_quarternote=TICKS_PER_BEAT, eventtime_is_ticks=True)
+        midi.addTempo(track=0, time=0, tempo=tempo)
+        for t, vel, dur in zip(sel["tick"].tolist(), sel["velocity"].tolist(), sel["duration"].tolist()):
+            midi.addNote(track=0, channel=9, pitch=note, time=t, duration=dur, volume=vel)
+        midi_files[name] = midi
+    return midi_files
@@ -0,0 +1,240 @@
+"""
+Content-addressed on-disk cache for generated MIDI clips.
+
+Seeded generation is deterministic, so the encoded files for a given (genre, seed, variation,
+tempo, humanization, GM mapping, layout) never change. GenerationCache stores them under a
+hash of those parameters; on a hit, generate_variation_files skips generation and encoding
+and hard-links (or just reports) the cached file instead of writing a new one.
+
+Usage:
+    cache = GenerationCache("~/.cache/midi-beats", max_bytes=256 * 1024 * 1024)
+    generate_midi_patterns("house", output_dir, seed_base=1000, cache=cache)
+    print(cache.stats())
+"""
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+# Bump when the meaning of cached bytes changes without the key parameters changing.
+CACHE_VERSION = 2
+
+ON_HIT_MODES = ("link", "report")
+
+
+class GenerationCache:
+    """
+    Size-bounded LRU cache of encoded MIDI files, keyed by generation parameters.
+
+    Each entry is a directory holding one file per part (an instrument name, or "all" for
+    multi-track layouts). Recency is kept in memory and mirrored to entry mtimes, so a new
+    process starts with the right eviction order after a single scan of the cache directory.
+    Entries are written to a temporary name and renamed into place, so processes sharing a
+    cache directory never see partial files.
+
+    Parameters:
+        cache_dir (str): Directory holding the cache (created if missing).
+        max_bytes (int): Total size of cached files above which least recently used entries
+            are evicted.
+        on_hit (str): "link" hard-links cached files into the output tree (falling back to a
+            copy when linking is not possible); "report" returns the cached file paths and
+            writes nothing to the output tree.
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, on_hit="link"):
+        if on_hit not in ON_HIT_MODES:
+            raise ValueError("Unsupported on_hit mode. Choose from 'link' or 'report'.")
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_bytes = max_bytes
+        self.on_hit = on_hit
+        self._lock = threading.Lock()
+        self._entries = None  # OrderedDict key -> size in bytes, least recently used first.
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    def __getstate__(self):
+        # Worker processes get the configuration only; they rebuild the index on first use.
+        return {"cache_dir": self.cache_dir, "max_bytes": self.max_bytes, "on_hit": self.on_hit}
+
+    def __setstate__(self, state):
+        self.__init__(state["cache_dir"], state["max_bytes"], state["on_hit"])
+
+    # --- Keys ---
+    @staticmethod
+    def make_key(**params):
+        """
+        Returns the hex digest identifying a set of generation parameters.
+
+        Parameters:
+            **params: Values that determine the generated bytes (genre, seed_base, variation,
+                tempo, velocity_var, timing_var, gm_mapping, layout, ...).
+
+        Returns:
+            str: SHA-256 hex digest.
+        """
+        canonical = repr((CACHE_VERSION, sorted((k, repr(v)) for k, v in params.items())))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    # --- Index ---
+    def _load_index(self):
+        """Scans the cache directory once and orders entries by mtime (oldest first)."""
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if not entry.is_dir():
+                        continue
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                    found.append((entry.stat().st_mtime, entry.name, size))
+        found.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in found)
+        self._size = sum(self._entries.values())
+
+    def _index(self):
+        if self._entries is None:
+            self._load_index()
+        return self._entries
+
+    def _evict(self, keep=None):
+        """
+        Removes least recently used entries until the cache fits in max_bytes. The entry keep
+        (the one just stored, hence the newest) is never removed, even if it alone is too big.
+        """
+        entries = self._index()
+        while self._size > self.max_bytes and entries:
+            if next(iter(entries)) == keep:
+                break
+            key, size = entries.popitem(last=False)
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            self._size -= size
+            self._evictions += 1
+
+    # --- Public API ---
+    def get(self, key, parts):
+        """
+        Looks up an entry.
+
+        Parameters:
+            key (str): Key from make_key.
+            parts (iterable): Part names the caller needs.
+
+        Returns:
+            dict or None: Mapping from part names to cached file paths if every part is
+                          present, otherwise None (counted as a miss).
+        """
+        entry_dir = self._entry_dir(key)
+        paths = {part: os.path.join(entry_dir, f"{part}.mid") for part in parts}
+        with self._lock:
+            entries = self._index()
+            if key in entries and all(os.path.exists(p) for p in paths.values()):
+                entries.move_to_end(key)
+                self._hits += 1
+                try:
+                    os.utime(entry_dir)
+                except OSError:
+                    pass
+                return paths
+            self._misses += 1
+            return None
+
+    def put(self, key, payloads):
+        """
+        Stores an entry and evicts older ones if the cache grows past max_bytes.
+
+        Parameters:
+            key (str): Key from make_key.
+            payloads (dict): Mapping from part names to encoded MIDI bytes.
+
+        Returns:
+            dict: Mapping from part names to cached file paths.
+        """
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        paths = {}
+        size = 0
+        for part, data in payloads.items():
+            path = os.path.join(entry_dir, f"{part}.mid")
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            paths[part] = path
+            size += len(data)
+        with self._lock:
+            entries = self._index()
+            self._size += size - entries.pop(key, 0)
+            entries[key] = size
+            self._stores += 1
+            self._evict(keep=key)
+        return paths
+
+    def materialize(self, cached_path, directory, stem, filenames):
+        """
+        Places a cached file in the output tree according to on_hit.
+
+        In "link" mode, an existing directory/stem.mid that is already a link to the cached
+        file is reused, so refreshing a library does not pile up _1, _2 duplicates.
+
+        Parameters:
+            cached_path (str): Path returned by get or put.
+            directory (str or None): Output directory (unused in "report" mode).
+            stem (str): Output file name without the ".mid" extension or suffix.
+            filenames (FilenameIndex): Name index used to claim a new output name.
+
+        Returns:
+            str: Path of the output file (the cached path itself in "report" mode).
+        """
+        if self.on_hit == "report":
+            return cached_path
+        existing = os.path.join(directory, f"{stem}.mid")
+        try:
+            if os.path.samefile(existing, cached_path):
+                return existing
+        except OSError:
+            pass
+        try:
+            return filenames.link_new(directory, stem, cached_path)
+        except OSError:
+            # No hard links here (other device, unsupported filesystem): copy instead.
+            with open(cached_path, "rb") as src:
+                data = src.read()
+            filepath, f = filenames.open_new(directory, stem)
+            with f:
+                f.write(data)
+            return filepath
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current size of the cache.
+
+        Returns:
+            dict: Keys "hits", "misses", "stores", "evictions", "entries", "bytes" and "max_bytes".
+                  Counters cover this process only.
+        """
+        with self._lock:
+            entries = self._index()
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "entries": len(entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        """Removes every entry from the cache directory."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self._entries = OrderedDict()
+            self._size = 0
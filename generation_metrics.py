@@ -0,0 +1,133 @@
+"""
+Per-stage timing and counters for library builds.
+
+Pass a GenerationMetrics object as metrics= to generate_midi_patterns (or stream_midi_patterns,
+generate_variation_files, generate_midi_patterns_batch). It accumulates wall time and call
+counts per pipeline stage, plus counters for variations, events, files and bytes. With
+metrics=None (the default) the generators skip every measurement, so there is no cost beyond
+one "is None" check per stage.
+
+Stages:
+    generate    pattern choices and template rendering (generate_drum_events)
+    humanize    velocity/timing offsets (humanize_instrument_events)
+    build       encoding MIDI bytes (smf writer or midiutil)
+    mkdir       creating output directories
+    resolve     picking a free file name (FilenameIndex, including the exclusive create)
+    write       writing bytes (the whole sink write for sinks that are not directories)
+
+Usage:
+    metrics = GenerationMetrics()
+    generate_midi_patterns("house", output_dir, num_variations=1000, metrics=metrics)
+    print(metrics.summary_table())
+    open("midi_beats.prom", "w").write(metrics.to_prometheus())
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("generate", "humanize", "build", "mkdir", "resolve", "write")
+COUNTERS = ("variations", "events", "files", "bytes", "cache_hits")
+
+
+class GenerationMetrics:
+    """
+    Accumulates per-stage wall time and counters. Safe to share between threads.
+
+    Parameters:
+        callback (callable or None): Called as callback(stage, seconds) for every timed stage
+            and callback(counter, n) for every count, e.g. to forward to a tracing system.
+            Not carried into batch worker processes; their totals are merged afterwards.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["callback"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # --- Recording ---
+    def add_time(self, stage, seconds):
+        """Adds one timed call of stage."""
+        with self._lock:
+            self.times[stage] = self.times.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+        if self.callback is not None:
+            self.callback(stage, seconds)
+
+    def count(self, counter, n=1):
+        """Adds n to counter."""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+        if self.callback is not None:
+            self.callback(counter, n)
+
+    @contextmanager
+    def timer(self, stage):
+        """Context manager timing its body as one call of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def merge(self, other):
+        """Adds the totals of another GenerationMetrics (e.g. from a worker process)."""
+        with self._lock:
+            for stage, seconds in other.times.items():
+                self.times[stage] = self.times.get(stage, 0.0) + seconds
+            for stage, calls in other.calls.items():
+                self.calls[stage] = self.calls.get(stage, 0) + calls
+            for counter, n in other.counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + n
+
+    # --- Export ---
+    def as_dict(self):
+        """Returns {"stages": {stage: {"seconds", "calls"}}, "counters": {...}, "elapsed": seconds}."""
+        with self._lock:
+            return {
+                "stages": {stage: {"seconds": self.times[stage], "calls": self.calls[stage]} for stage in self.times},
+                "counters": dict(self.counters),
+                "elapsed": time.perf_counter() - self._started,
+            }
+
+    def summary_table(self):
+        """Returns a plain-text table of stage times (with shares of the total) and counters."""
+        data = self.as_dict()
+        total = sum(s["seconds"] for s in data["stages"].values())
+        lines = [f"{'stage':<10} {'seconds':>10} {'share':>7} {'calls':>10} {'us/call':>10}"]
+        for stage, s in data["stages"].items():
+            share = s["seconds"] / total if total else 0.0
+            per_call = s["seconds"] / s["calls"] * 1e6 if s["calls"] else 0.0
+            lines.append(f"{stage:<10} {s['seconds']:>10.4f} {share:>7.1%} {s['calls']:>10} {per_call:>10.1f}")
+        lines.append(f"{'total':<10} {total:>10.4f}")
+        lines.append("")
+        lines.extend(f"{counter:<10} {n:>10}" for counter, n in data["counters"].items())
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix="midi_beats"):
+        """Returns the metrics in the Prometheus text exposition format."""
+        data = self.as_dict()
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Wall time spent in each generation stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines.extend(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {s["seconds"]:.9f}' for stage, s in data["stages"].items())
+        lines.append(f"# HELP {prefix}_stage_calls_total Number of timed calls of each generation stage.")
+        lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+        lines.extend(f'{prefix}_stage_calls_total{{stage="{stage}"}} {s["calls"]}' for stage, s in data["stages"].items())
+        for counter, n in data["counters"].items():
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {n}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,382 @@
+"""
+Resident generation service: keeps genre templates and the MIDI writer warm and returns clips
+over a small local HTTP API, on a TCP port or a Unix socket.
+
+Starting a Python process per request costs far more than generating a clip. The server
+compiles the genres once per worker and answers each request with the MIDI bytes in the
+response body. Nothing is written to disk. Requests are parsed on an asyncio event loop and
+generation runs on a worker pool, so slow clients never block generation and several
+requests are served at once.
+
+Endpoints:
+    GET /generate?genre=house&variation=3&seed=1000[&tempo=124][&instrument=kick]
+        [&velocity_var=15][&timing_var=0.02][&groove=ukg][&writer=smf]
+        Returns audio/midi: the variation as one multi-track file, or the file of a single
+        instrument if instrument is given. POST /generate with the same fields as a JSON
+        object body also works.
+    GET /genres
+        Returns the available genre names as JSON.
+    GET /stats
+        Returns request counts and p50/p99 latency (milliseconds) as JSON.
+
+Usage:
+    python -m generation_server --port 8765
+    python -m generation_server --unix /tmp/midi-beats.sock --workers 4
+    curl -o clip.mid "http://127.0.0.1:8765/generate?genre=dnb&variation=2&seed=7"
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlsplit
+
+import smf_writer
+from drum_pattern_generator import (
+    BEATS_PER_VARIATION,
+    DEFAULT_GM_MAPPING,
+    available_genres,
+    encode_midi_files,
+    encode_multitrack_midi_file,
+    generate_variation_events,
+    get_genre,
+    get_groove,
+    resolve_tempo,
+)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+# Largest accepted timing_var, in beats: one 4-bar clip.
+MAX_TIMING_VAR = BEATS_PER_VARIATION
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# --- Worker Side ---
+def _warm_worker(genres):
+    """Pool initializer: compiles the genres and runs one encode so the first request is fast."""
+    for genre in genres:
+        get_genre(genre)
+    if genres:
+        render_clip(genres[0], 1, seed_base=0)
+
+
+def render_clip(genre, variation=1, velocity_var=15, timing_var=0.02, tempo=None, seed_base=None, instrument=None, writer="smf", groove=None):
+    """
+    Generates one variation and returns its encoded MIDI bytes.
+
+    Parameters:
+        genre (str): A registered genre, e.g. "house", "ukg", "dnb" or "breaks".
+        variation (int): 1-based variation index.
+        velocity_var (int): Maximum variation in velocity for humanization.
+        timing_var (float): Maximum variation in timing for humanization.
+        tempo (float or None): Tempo (BPM); if None, the genre's default tempo.
+        seed_base (int or None): Seed value for reproducibility; if None, randomness is not fixed.
+        instrument (str or None): If given, only this instrument's clip is returned; otherwise
+            one multi-track file holding every instrument.
+        writer (str): MIDI encoder, "smf" (direct) or "midiutil" (fallback).
+        groove (str or None): Name of a groove applied during humanization (see available_grooves).
+
+    Returns:
+        bytes: The encoded MIDI file, identical to what generate_variation_files would write.
+    """
+    if instrument is not None and instrument not in DEFAULT_GM_MAPPING:
+        choices = ", ".join(f"'{inst}'" for inst in DEFAULT_GM_MAPPING)
+        raise ValueError(f"Unsupported instrument. Choose from {choices}.")
+    tempo = resolve_tempo(genre, tempo)
+    events = generate_variation_events(genre, variation, velocity_var=velocity_var, timing_var=timing_var, seed_base=seed_base, groove=groove)
+    if instrument is None:
+        return encode_multitrack_midi_file(events, tempo=tempo, writer=writer)
+    return encode_midi_files({instrument: events[instrument]}, tempo=tempo, writer=writer)[instrument]
+
+
+# --- Requests ---
+def parse_generate_params(fields):
+    """
+    Validates /generate fields (strings from a query, or JSON values) into render_clip arguments.
+
+    Raises:
+        ValueError: If a field is missing, has the wrong type or names an unknown genre or groove.
+    """
+    def number(name, kind, default):
+        value = fields.get(name)
+        if value is None or value == "":
+            return default
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}' must be a{'n integer' if kind is int else ' number'}.") from None
+
+    genre = fields.get("genre")
+    if not genre:
+        raise ValueError("'genre' is required.")
+    get_genre(str(genre))
+    variation = number("variation", int, 1)
+    if variation < 1:
+        raise ValueError("'variation' must be at least 1.")
+    writer = fields.get("writer") or "smf"
+    if writer not in ("smf", "midiutil"):
+        raise ValueError("Unsupported writer. Choose from 'smf' or 'midiutil'.")
+    tempo = number("tempo", float, None)
+    if tempo is not None and not smf_writer.MIN_TEMPO <= tempo <= smf_writer.MAX_TEMPO:
+        raise ValueError(f"'tempo' must be between {smf_writer.MIN_TEMPO:.2f} and {smf_writer.MAX_TEMPO:.0f} BPM.")
+    timing_var = number("timing_var", float, 0.02)
+    # Hits may move by at most one clip length, which keeps every tick encodable.
+    if not 0 <= timing_var <= MAX_TIMING_VAR:
+        raise ValueError(f"'timing_var' must be between 0 and {MAX_TIMING_VAR:g} beats.")
+    instrument = fields.get("instrument") or None
+    if instrument is not None and not isinstance(instrument, str):
+        raise ValueError("'instrument' must be a string.")
+    groove = fields.get("groove") or None
+    if groove is not None:
+        if not isinstance(groove, str):
+            raise ValueError("'groove' must be a string.")
+        groove = get_groove(groove).name
+    return {
+        "genre": str(genre).lower(),
+        "variation": variation,
+        "velocity_var": number("velocity_var", int, 15),
+        "timing_var": timing_var,
+        "tempo": tempo,
+        "seed_base": number("seed", int, None),
+        "instrument": instrument,
+        "writer": writer,
+        "groove": groove,
+    }
+
+
+class LatencyRecorder:
+    """
+    Keeps the most recent request latencies and reports percentiles over them.
+
+    Parameters:
+        window (int): Number of most recent samples percentiles are computed over.
+    """
+
+    def __init__(self, window=10000):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds, ok=True):
+        self._samples.append(seconds)
+        self.count += 1
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, p):
+        """Returns the p-th percentile (0-100) of the recorded latencies in seconds, or None."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+    def summary(self):
+        """Returns counts and p50/p99/max latency in milliseconds."""
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+        return {
+            "requests": self.count,
+            "errors": self.errors,
+            "p50_ms": ms(self.percentile(50)),
+            "p99_ms": ms(self.percentile(99)),
+            "max_ms": ms(max(self._samples) if self._samples else None),
+        }
+
+
+# --- Server ---
+class GenerationServer:
+    """
+    asyncio HTTP/1.1 server answering generation requests from a worker pool.
+
+    Parameters:
+        workers (int or None): Worker processes (defaults to os.cpu_count()). 0 runs generation
+            on a single thread of the server process, which avoids process start-up for
+            light use.
+        genres (iterable or None): Genres compiled in every worker at start-up; defaults to
+            every registered genre.
+    """
+
+    def __init__(self, workers=None, genres=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.genres = tuple(available_genres() if genres is None else genres)
+        self.latency = LatencyRecorder()
+        self._executor = None
+        self._server = None
+
+    def _start_executor(self):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if self.workers == 0:
+            self._executor = ThreadPoolExecutor(max_workers=1, initializer=_warm_worker, initargs=(self.genres,))
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker, initargs=(self.genres,))
+        # Start (and warm) every worker before accepting connections.
+        for future in [self._executor.submit(get_genre, self.genres[0]) for _ in range(max(1, self.workers))]:
+            future.result()
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        """
+        Starts the worker pool and begins accepting connections.
+
+        Parameters:
+            host (str): Interface to bind; keep the default to accept local clients only.
+            port (int): TCP port (0 picks a free one; see the address attribute).
+            unix_path (str or None): If given, listen on this Unix socket instead of TCP.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._start_executor)
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host=host, port=port)
+
+    @property
+    def address(self):
+        """The bound (host, port) tuple or Unix socket path."""
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stops accepting connections and shuts the worker pool down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 413, _json_body({"error": "Request header too large."}), "application/json", close=True)
+                    return
+                if len(head) > MAX_HEADER_BYTES:
+                    await self._respond(writer, 413, _json_body({"error": "Request header too large."}), "application/json", close=True)
+                    return
+                lines = head.decode("iso-8859-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, _json_body({"error": "Malformed request line."}), "application/json", close=True)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length") or "0"
+                if not (length.isascii() and length.isdigit()):
+                    await self._respond(writer, 400, _json_body({"error": "Invalid Content-Length."}), "application/json", close=True)
+                    return
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, _json_body({"error": "Request body too large."}), "application/json", close=True)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+
+                started = time.perf_counter()
+                status, payload, content_type = await self._dispatch(method, target, body)
+                if urlsplit(target).path == "/generate":
+                    self.latency.record(time.perf_counter() - started, ok=status == 200)
+                await self._respond(writer, status, payload, content_type, close=close)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down with the connection idle.
+            return
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body):
+        """Returns (status, body bytes, content type) for one request."""
+        url = urlsplit(target)
+        if url.path == "/genres":
+            return 200, _json_body(available_genres()), "application/json"
+        if url.path == "/stats":
+            return 200, _json_body(dict(self.latency.summary(), workers=self.workers)), "application/json"
+        if url.path != "/generate":
+            return 404, _json_body({"error": f"No such endpoint: {url.path}"}), "application/json"
+        if method not in ("GET", "POST"):
+            return 405, _json_body({"error": "Use GET or POST."}), "application/json"
+
+        fields = dict(parse_qsl(url.query))
+        try:
+            if method == "POST" and body:
+                data = json.loads(body)
+                if not isinstance(data, dict):
+                    raise ValueError("The request body must be a JSON object.")
+                fields.update(data)
+            params = parse_generate_params(fields)
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self._executor, _render_from_params, params)
+        except ValueError as exc:
+            return 400, _json_body({"error": str(exc)}), "application/json"
+        except Exception as exc:
+            return 500, _json_body({"error": f"{type(exc).__name__}: {exc}"}), "application/json"
+        return 200, data, "audio/midi"
+
+    @staticmethod
+    async def _respond(writer, status, payload, content_type, close=False):
+        head = (
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode("ascii") + payload)
+        await writer.drain()
+
+
+def _render_from_params(params):
+    return render_clip(**params)
+
+
+def _json_body(value):
+    return json.dumps(value).encode("utf-8")
+
+
+async def serve(host="127.0.0.1", port=8765, unix_path=None, workers=None, genres=None):
+    """
+    Runs a GenerationServer until cancelled, then prints its latency summary.
+
+    Parameters:
+        host, port, unix_path: Where to listen; see GenerationServer.start.
+        workers, genres: See GenerationServer.
+    """
+    server = GenerationServer(workers=workers, genres=genres)
+    await server.start(host=host, port=port, unix_path=unix_path)
+    print(f"Serving on {server.address} with {server.workers} worker(s)", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        print(f"Latency: {server.latency.summary()}", flush=True)
+
+
+def main(argv=None):
+    """Command line entry point: python -m generation_server [--port N | --unix PATH]."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m generation_server", description="Serve drum pattern MIDI clips over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765).")
+    parser.add_argument("--unix", default=None, metavar="PATH", help="Listen on a Unix socket instead of TCP.")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count; 0 = in-process thread).")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(host=args.host, port=args.port, unix_path=args.unix, workers=args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
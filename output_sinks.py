@@ -0,0 +1,487 @@
+"""
+Output sinks: where the generators put encoded clips.
+
+Every file is handed to a sink as (directory, stem, data), with directory relative to the
+sink's root. DirectorySink writes files (the default), ThreadedDirectorySink writes them on a
+pool of background threads, and MemorySink, BufferSink and SocketSink keep clips off the
+filesystem. archive_sink.ArchiveSink builds on the same Sink interface.
+
+FilenameIndex and PathClaims pick free "stem.mid", "stem_1.mid", ... names, on disk and in
+memory respectively. drum_pattern_generator re-exports everything public here.
+"""
+import os
+import time
+
+
+class FilenameIndex:
+    """
+    Picks free "stem.mid", "stem_1.mid", "stem_2.mid", ... names without probing the disk per name.
+
+    Each directory is scanned once; after that, the names already taken and the next suffix to
+    try for each stem are kept in memory, so reruns into the same folder cost O(1) per file.
+    Names are claimed with exclusive create (O_EXCL), so concurrent writers into one output
+    tree never overwrite each other's files; a writer that loses a race moves on to the next
+    suffix.
+    """
+    __slots__ = ("_taken", "_next_suffix")
+
+    def __init__(self):
+        self._taken = {}
+        self._next_suffix = {}
+
+    def scan(self, directory):
+        """
+        Reads directory's file names now, unless it has been scanned already.
+
+        Claims scan a directory on first use anyway; calling this up front (for example from a
+        worker thread while the directory is created) takes the listing off the first write.
+        A directory that does not exist yet is recorded as empty.
+
+        Parameters:
+            directory (str): Directory to scan.
+        """
+        if directory not in self._taken:
+            try:
+                with os.scandir(directory) as it:
+                    self._taken[directory] = {entry.name for entry in it}
+            except FileNotFoundError:
+                self._taken[directory] = set()
+
+    def _names_in(self, directory):
+        self.scan(directory)
+        return self._taken[directory]
+
+    def _claim(self, directory, stem, create):
+        """Calls create(path) on candidate names until one does not raise FileExistsError."""
+        taken = self._names_in(directory)
+        key = (directory, stem)
+        n = self._next_suffix.get(key, 0)
+        while True:
+            filename = f"{stem}.mid" if n == 0 else f"{stem}_{n}.mid"
+            n += 1
+            if filename in taken:
+                continue
+            filepath = os.path.join(directory, filename)
+            try:
+                result = create(filepath)
+            except FileExistsError:
+                taken.add(filename)
+                continue
+            taken.add(filename)
+            self._next_suffix[key] = n
+            return filepath, result
+
+    def open_new(self, directory, stem):
+        """
+        Creates and opens the first free name for stem in directory.
+
+        Parameters:
+            directory (str): Existing directory to create the file in.
+            stem (str): File name without the ".mid" extension or suffix.
+
+        Returns:
+            tuple: (path, file) where file is opened for binary writing.
+        """
+        def create(filepath):
+            fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+            return os.fdopen(fd, "wb")
+        return self._claim(directory, stem, create)
+
+    def link_new(self, directory, stem, source):
+        """
+        Hard-links source to the first free name for stem in directory.
+
+        Parameters:
+            directory (str): Existing directory to create the link in.
+            stem (str): File name without the ".mid" extension or suffix.
+            source (str): Existing file to link to.
+
+        Returns:
+            str: The path of the new link.
+
+        Raises:
+            OSError: If the filesystem does not support hard links to source (e.g. across devices).
+        """
+        return self._claim(directory, stem, lambda filepath: os.link(source, filepath))[0]
+
+
+def _write_new_file(directory, stem, data, filenames=None):
+    """Writes data to directory/stem.mid, appending an incrementing suffix if the name is taken."""
+    if filenames is None:
+        filenames = FilenameIndex()
+    filepath, f = filenames.open_new(directory, stem)
+    with f:
+        f.write(data)
+    return filepath
+
+
+# --- Output Sinks ---
+class Sink:
+    """
+    Destination for encoded clips. The generators hand every file to a sink as
+    (directory, stem, data); directory is relative to the sink's root and uses "/" separators
+    (e.g. "house/variation_2"), stem is the file name without ".mid" or suffix.
+
+    Subclasses implement write; sinks are context managers that close on exit. A sink that
+    times its own stages sets metrics; the generators time the whole write call otherwise.
+    """
+    metrics = None
+
+    def write(self, directory, stem, data):
+        """
+        Stores one encoded clip.
+
+        Parameters:
+            directory (str): Relative directory, "/"-separated.
+            stem (str): File name without the ".mid" extension or suffix.
+            data (bytes-like): Encoded MIDI file.
+
+        Returns:
+            str: Where the clip went (a file path, or a relative path key).
+        """
+        raise NotImplementedError
+
+    def prepare(self, directories):
+        """
+        Called with every relative directory of a run before its first write, for sinks that
+        can set up their whole tree at once. The default does nothing.
+        """
+
+    def write_file(self, directory, stem, source):
+        """Stores the contents of an existing file (e.g. a cached clip) at directory/stem."""
+        with open(source, "rb") as f:
+            return self.write(directory, stem, f.read())
+
+    def close(self):
+        """Flushes and releases the sink's resources."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# fsync policies of DirectorySink: leave flushing to the OS, fsync each file as it is
+# written, or fsync every written file once when the sink is closed.
+FSYNC_POLICIES = ("none", "file", "run")
+
+
+def _fsync_path(path):
+    """fsyncs an existing file or directory by path."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_directory(path):
+    """fsyncs a directory so new entries in it are durable; skipped where unsupported (Windows)."""
+    try:
+        _fsync_path(path)
+    except OSError:
+        pass
+
+
+class DirectorySink(Sink):
+    """
+    Writes clips as files under root, creating each directory once and picking free names with
+    a FilenameIndex. This is what the generators use when no sink is given.
+
+    Parameters:
+        root (str): Top-level output directory.
+        filenames (FilenameIndex or None): Name index to claim files with; a new one if None.
+        metrics (GenerationMetrics or None): If provided, records the "mkdir", "resolve" and
+            "write" stage times.
+        fsync (str): One of FSYNC_POLICIES. "file" fsyncs each file before closing it; "run"
+            fsyncs every written file on close. Both also fsync the written directories on close.
+    """
+
+    def __init__(self, root, filenames=None, metrics=None, fsync="none"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unsupported fsync policy. Choose from 'none', 'file' or 'run'.")
+        self.root = root
+        self.filenames = FilenameIndex() if filenames is None else filenames
+        self.metrics = metrics
+        self.fsync = fsync
+        self._made = set()
+        # Files and directories still to fsync on close.
+        self._unsynced = []
+        self._dirty = set()
+
+    def _full_path(self, directory):
+        return os.path.join(self.root, *directory.split("/"))
+
+    def path(self, directory):
+        """Returns the filesystem path of a relative sink directory (creating it on first use)."""
+        full = self._full_path(directory)
+        if full not in self._made:
+            if self.metrics is None:
+                os.makedirs(full, exist_ok=True)
+            else:
+                start = time.perf_counter()
+                os.makedirs(full, exist_ok=True)
+                self.metrics.add_time("mkdir", time.perf_counter() - start)
+            self._made.add(full)
+        return full
+
+    def prepare(self, directories):
+        """Creates every directory of a run up front, each once."""
+        for directory in dict.fromkeys(directories):
+            self.path(directory)
+
+    def write(self, directory, stem, data):
+        directory = self.path(directory)
+        if self.metrics is None:
+            if self.fsync == "none":
+                return _write_new_file(directory, stem, data, self.filenames)
+            filepath, f = self.filenames.open_new(directory, stem)
+        else:
+            start = time.perf_counter()
+            filepath, f = self.filenames.open_new(directory, stem)
+            self.metrics.add_time("resolve", time.perf_counter() - start)
+        self._track(directory, filepath)
+        self._store(f, data)
+        return filepath
+
+    def _track(self, directory, filepath):
+        """Remembers what close has to fsync under the sink's policy."""
+        if self.fsync == "none":
+            return
+        self._dirty.add(directory)
+        if self.fsync == "run":
+            self._unsynced.append(filepath)
+
+    def _store(self, f, data):
+        """Writes data to a claimed file, fsyncs it under the "file" policy and closes it."""
+        if self.metrics is not None:
+            start = time.perf_counter()
+        with f:
+            f.write(data)
+            if self.fsync == "file":
+                f.flush()
+                os.fsync(f.fileno())
+        if self.metrics is not None:
+            self.metrics.add_time("write", time.perf_counter() - start)
+
+    def _sync_pending(self, map_fn=map):
+        """fsyncs the files and directories recorded by _track, using map_fn to fan out."""
+        unsynced, self._unsynced = self._unsynced, []
+        dirty, self._dirty = self._dirty, set()
+        for _ in map_fn(_fsync_path, unsynced):
+            pass
+        for _ in map_fn(_fsync_directory, dirty):
+            pass
+
+    def close(self):
+        self._sync_pending()
+
+
+class ThreadedDirectorySink(DirectorySink):
+    """
+    DirectorySink whose file writes run on a pool of background threads.
+
+    write still claims the file name on the calling thread (one exclusive create, so the
+    returned path is final and nothing is overwritten), then queues the bytes; a writer thread
+    writes, fsyncs under the "file" policy and closes the file. At most max_pending writes are
+    outstanding, after which write blocks, so generation overlaps with slow storage (NFS or SMB
+    shares) by a bounded amount. prepare creates a run's directory tree on the pool, and close
+    waits for the queue to drain and runs the "run" policy's fsyncs on the pool.
+
+    A failed background write is raised by the next write or by close. Always close the sink
+    (or use it as a context manager); until then files may still be incomplete.
+
+    Parameters:
+        root, filenames, metrics, fsync: As for DirectorySink. Metrics are recorded from the
+            writer threads as well.
+        max_workers (int): Writer threads.
+        max_pending (int): Writes queued or in progress before write blocks.
+    """
+
+    def __init__(self, root, filenames=None, metrics=None, fsync="none", max_workers=4, max_pending=64):
+        super().__init__(root, filenames, metrics, fsync)
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="midi-writer")
+        self._max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._error = None
+        self._closed = False
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _done(self, future):
+        if self._error is None and future.exception() is not None:
+            self._error = future.exception()
+        self._slots.release()
+
+    def prepare(self, directories):
+        """Creates every directory of a run and scans it for taken names, on the writer threads."""
+        todo = [full for full in dict.fromkeys(map(self._full_path, directories)) if full not in self._made]
+
+        def make(full):
+            os.makedirs(full, exist_ok=True)
+            self.filenames.scan(full)
+
+        if self.metrics is not None:
+            start = time.perf_counter()
+        for _ in self._pool.map(make, todo):
+            pass
+        if self.metrics is not None:
+            self.metrics.add_time("mkdir", time.perf_counter() - start)
+        self._made.update(todo)
+
+    def write(self, directory, stem, data):
+        if self._closed:
+            raise ValueError("Write to a closed ThreadedDirectorySink.")
+        self._raise_error()
+        directory = self.path(directory)
+        self._slots.acquire()
+        try:
+            if self.metrics is None:
+                filepath, f = self.filenames.open_new(directory, stem)
+            else:
+                start = time.perf_counter()
+                filepath, f = self.filenames.open_new(directory, stem)
+                self.metrics.add_time("resolve", time.perf_counter() - start)
+            self._pool.submit(self._store, f, data).add_done_callback(self._done)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._track(directory, filepath)
+        return filepath
+
+    def flush(self):
+        """Blocks until every queued write has finished, then raises the first failure, if any."""
+        for _ in range(self._max_pending):
+            self._slots.acquire()
+        for _ in range(self._max_pending):
+            self._slots.release()
+        self._raise_error()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.flush()
+            self._sync_pending(self._pool.map)
+        finally:
+            self._pool.shutdown(wait=True)
+
+
+class PathClaims:
+    """
+    In-memory counterpart of FilenameIndex for sinks without a filesystem: claim returns
+    "directory/stem.mid", then "directory/stem_1.mid", ... for repeated stems.
+    """
+    __slots__ = ("_taken", "_next_suffix")
+
+    def __init__(self):
+        self._taken = set()
+        self._next_suffix = {}
+
+    def claim(self, directory, stem):
+        """Returns the first unclaimed relative path for stem in directory and claims it."""
+        key = f"{directory}/{stem}" if directory else stem
+        n = self._next_suffix.get(key, 0)
+        while True:
+            path = f"{key}.mid" if n == 0 else f"{key}_{n}.mid"
+            n += 1
+            if path not in self._taken:
+                break
+        self._taken.add(path)
+        self._next_suffix[key] = n
+        return path
+
+
+class MemorySink(Sink):
+    """
+    Keeps clips in memory, in write order, as {"house/variation_1/kick_house_1.mid": bytes}.
+
+    Names are claimed like DirectorySink claims files, so writing the same stem twice gives
+    "stem.mid" and "stem_1.mid".
+    """
+
+    def __init__(self):
+        self.files = {}
+        self._paths = PathClaims()
+
+    def write(self, directory, stem, data):
+        path = self._paths.claim(directory, stem)
+        self.files[path] = bytes(data)
+        return path
+
+
+class BufferSink(Sink):
+    """
+    Packs clips back to back into a caller-provided writable buffer, without copies in between.
+
+    Parameters:
+        buffer: A writable bytes-like object (bytearray, mmap, writable memoryview, ...). A
+            bytearray grows when full; any other buffer raises ValueError when a clip does not fit.
+            A bytearray cannot be resized while a memoryview of it (e.g. from view) is alive, so
+            growing it then copies it into a new, larger bytearray: self.buffer is replaced, and
+            views taken earlier keep pointing at the old copy.
+        offset (int): Position of the first clip in buffer.
+
+    Attributes:
+        index (dict): Relative path -> (offset, length) of each clip in buffer.
+        offset (int): End of the last clip written.
+    """
+
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+        self.index = {}
+        self._paths = PathClaims()
+
+    def write(self, directory, stem, data):
+        path = self._paths.claim(directory, stem)
+        end = self.offset + len(data)
+        if end > len(self.buffer):
+            if not isinstance(self.buffer, bytearray):
+                raise ValueError(f"Buffer too small: {path} needs {end} bytes, buffer holds {len(self.buffer)}.")
+            try:
+                self.buffer.extend(bytes(end - len(self.buffer)))
+            except BufferError:
+                # A view of the buffer is still held; grow a copy instead.
+                grown = bytearray(end)
+                grown[:self.offset] = memoryview(self.buffer)[:self.offset]
+                self.buffer = grown
+        memoryview(self.buffer)[self.offset:end] = data
+        self.index[path] = (self.offset, len(data))
+        self.offset = end
+        return path
+
+    def view(self, path):
+        """Returns a memoryview of one clip inside the buffer."""
+        offset, length = self.index[path]
+        return memoryview(self.buffer)[offset:offset + length]
+
+
+class SocketSink(Sink):
+    """
+    Sends clips over a connected socket (or anything with sendall), one frame per clip:
+    a 4-byte big-endian path length, the UTF-8 relative path, a 4-byte big-endian data length
+    and the MIDI bytes. Paths are not de-duplicated, so an endless stream keeps no state.
+
+    Parameters:
+        sock: Connected socket.socket, or any object with a sendall(bytes) method.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def write(self, directory, stem, data):
+        path = f"{directory}/{stem}.mid" if directory else f"{stem}.mid"
+        encoded = path.encode("utf-8")
+        self.sock.sendall(b"".join((
+            len(encoded).to_bytes(4, "big"), encoded, len(data).to_bytes(4, "big"), bytes(data),
+        )))
+        return path
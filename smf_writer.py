@@ -0,0 +1,195 @@
+"""
+Direct Standard MIDI File writer for drum clips.
+
+Encodes sorted (tick, velocity) hits straight into SMF bytes: a header chunk, a tempo track
+and one note track per pitch, with delta-time note-on/off pairs on the drum channel. It
+reproduces what midiutil's MIDIFile writes for the same notes (format 1, separate tempo
+track, duplicate removal and note de-interleaving), byte for byte, without building
+midiutil's per-event objects.
+"""
+import struct
+
+TICKS_PER_BEAT = 960
+DRUM_CHANNEL = 9
+DEFAULT_DURATION = 0.1
+# The set-tempo event stores whole microseconds per beat in 24 bits: slower tempos do not fit,
+# and faster ones than one microsecond per beat would store 0.
+MIN_TEMPO = 60000000 / 0xFFFFFF
+MAX_TEMPO = 60000000.0
+# Delta times are variable-length quantities of at most 4 bytes.
+MAX_TICK = 0x0FFFFFFF
+
+_NOTE_OFF = 2  # Note-offs sort before note-ons at the same tick, as in midiutil.
+_NOTE_ON = 3
+_END_OF_TRACK = b"\x00\xff\x2f\x00"
+
+
+def _write_var_length(buf, value):
+    """Appends value to buf as a MIDI variable-length quantity."""
+    if value < 0x80:
+        buf.append(value)
+        return
+    vlbytes = []
+    hibit = 0x00
+    while value > 0:
+        vlbytes.append((value & 0x7F) | hibit)
+        value >>= 7
+        hibit = 0x80
+    vlbytes.reverse()
+    buf.extend(vlbytes)
+
+
+def _track_chunk(body):
+    """Returns an MTrk chunk wrapping body (which must not include end-of-track)."""
+    return b"MTrk" + struct.pack(">L", len(body) + 4) + bytes(body) + _END_OF_TRACK
+
+
+def encode_note_track(hits, pitch, channel=DRUM_CHANNEL, duration=DEFAULT_DURATION, ticks_per_beat=TICKS_PER_BEAT, name=None):
+    """
+    Encodes one pitch's hits as an MTrk chunk.
+
+    Parameters:
+        hits (list): (tick, velocity) tuples sorted by tick; ticks are integers at ticks_per_beat.
+        pitch (int): MIDI note number for every hit.
+        channel (int): MIDI channel (0-15); 9 is the General MIDI drum channel.
+        duration (float): Note length in beats.
+        ticks_per_beat (int): Timebase (ticks per quarter note).
+        name (str or None): If provided, a track name meta event is written at tick 0.
+
+    Returns:
+        bytes: The complete track chunk.
+
+    Raises:
+        ValueError: If a note ends after MAX_TICK.
+    """
+    dur = int(duration * ticks_per_beat)
+    seen = set()
+    evs = []
+    for order, (tick, vel) in enumerate(hits):
+        # Two notes starting on the same tick collapse into the first one.
+        if tick in seen:
+            continue
+        seen.add(tick)
+        evs.append((tick, _NOTE_ON, order, vel))
+        evs.append((tick + dur, _NOTE_OFF, order, vel))
+    evs.sort()
+
+    # A note still sounding when the next one starts is cut off at that start.
+    pending = []
+    for k, (tick, kind, order, vel) in enumerate(evs):
+        if kind == _NOTE_ON:
+            pending.append(tick)
+        elif len(pending) > 1:
+            evs[k] = (pending.pop(), kind, order, vel)
+        else:
+            pending.pop()
+    evs.sort()
+    if evs and evs[-1][0] > MAX_TICK:
+        raise ValueError(f"Note at tick {evs[-1][0]} is past the last encodable tick ({MAX_TICK}).")
+
+    on_status = 0x90 | channel
+    off_status = 0x80 | channel
+    body = bytearray()
+    if name is not None:
+        encoded = name.encode("ISO-8859-1")
+        body.extend(b"\x00\xff\x03")
+        _write_var_length(body, len(encoded))
+        body.extend(encoded)
+    previous = 0
+    for tick, kind, _, vel in evs:
+        _write_var_length(body, tick - previous)
+        previous = tick
+        body.append(on_status if kind == _NOTE_ON else off_status)
+        body.append(pitch)
+        body.append(vel)
+    return _track_chunk(body)
+
+
+def encode_tempo_track(tempo):
+    """
+    Encodes a tempo track holding a single set-tempo meta event at tick 0.
+
+    Parameters:
+        tempo (float): Tempo (BPM).
+
+    Returns:
+        bytes: The complete track chunk.
+
+    Raises:
+        ValueError: If tempo is outside MIN_TEMPO..MAX_TEMPO (or not a number).
+    """
+    if not MIN_TEMPO <= tempo <= MAX_TEMPO:
+        raise ValueError(f"Tempo must be between {MIN_TEMPO:.2f} and {MAX_TEMPO:.0f} BPM.")
+    return _track_chunk(b"\x00\xff\x51\x03" + struct.pack(">L", int(60000000 / tempo))[1:])
+
+
+def encode_smf(note_tracks, tempo=120.0, ticks_per_beat=TICKS_PER_BEAT):
+    """
+    Assembles a format 1 Standard MIDI File from already encoded note tracks.
+
+    Parameters:
+        note_tracks (list): Track chunks, e.g. from encode_note_track.
+        tempo (float): Tempo (BPM) written to the leading tempo track.
+        ticks_per_beat (int): Timebase (ticks per quarter note).
+
+    Returns:
+        bytes: The complete file.
+    """
+    header = b"MThd" + struct.pack(">LHHH", 6, 1, len(note_tracks) + 1, ticks_per_beat)
+    return b"".join([header, encode_tempo_track(tempo)] + list(note_tracks))
+
+
+def encode_instrument_midi(hits, pitch, tempo=120.0, channel=DRUM_CHANNEL, duration=DEFAULT_DURATION):
+    """
+    Encodes a single-instrument clip, equivalent to a one-track midiutil MIDIFile.
+
+    Parameters:
+        hits (list): (tick, velocity) tuples sorted by tick.
+        pitch (int): MIDI note number for every hit.
+        tempo (float): Tempo (BPM).
+        channel (int): MIDI channel (0-15).
+        duration (float): Note length in beats.
+
+    Returns:
+        bytes: The complete file.
+    """
+    return encode_smf([encode_note_track(hits, pitch, channel, duration)], tempo)
+
+
+def encode_multitrack_midi(tracks, tempo=120.0, channel=DRUM_CHANNEL, duration=DEFAULT_DURATION):
+    """
+    Encodes several instruments as one format 1 file with a named track per instrument.
+
+    Parameters:
+        tracks (list): (name, pitch, hits) triples; hits are (tick, velocity) tuples sorted by tick.
+        tempo (float): Tempo (BPM).
+        channel (int): MIDI channel (0-15).
+        duration (float): Note length in beats.
+
+    Returns:
+        bytes: The complete file.
+    """
+    return encode_smf(
+        [encode_note_track(hits, pitch, channel, duration, name=name) for name, pitch, hits in tracks],
+        tempo,
+    )
+
+
+def write_instrument_midi(f, hits, pitch, tempo=120.0, channel=DRUM_CHANNEL, duration=DEFAULT_DURATION):
+    """
+    Writes a single-instrument clip to any binary file-like object in one write call.
+
+    Parameters:
+        f: Object with a write(bytes) method, e.g. an open file or io.BytesIO.
+        hits (list): (tick, velocity) tuples sorted by tick.
+        pitch (int): MIDI note number for every hit.
+        tempo (float): Tempo (BPM).
+        channel (int): MIDI channel (0-15).
+        duration (float): Note length in beats.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    data = encode_instrument_midi(hits, pitch, tempo, channel, duration)
+    f.write(data)
+    return len(data)
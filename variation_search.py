@@ -0,0 +1,254 @@
+"""
+Top-K variation search: scan a large pool of seeded variations and keep only the best-scoring
+distinct patterns.
+
+Before humanization, a variation's pattern is fixed by its choice vector (one option per
+genre decision), and make_rng(seed_base, variation) draws that vector with a handful of
+random() calls. The search therefore never renders or encodes a candidate. It draws each
+candidate's choice vector and keeps the first variation of each distinct pattern, keyed by
+CompiledPattern.fingerprint like the deduplication in drum_pattern_generator, so vectors that
+render the same events count once. Each distinct pattern is scored once, from its compiled
+template. A bounded heap keeps the top_k. Only the winners go through the full pipeline
+(generate_variation_files), so they are written exactly as a normal run with the same
+seed_base would write them.
+
+A genre has few distinct patterns (see count_unique_patterns), so by default the scan stops
+as soon as all of them have been seen. Later candidates could only repeat a pattern already
+found, at a higher variation number.
+
+Metrics (all from the un-humanized template):
+    density           hits per bar
+    syncopation       mean off-beat weight of the hits: 0 on the beat, 0.5 on the off-beat
+                      8th, 1 anywhere else (16ths)
+    fill_complexity   hits added or removed in the fill bars (B and C) relative to bar A
+    distance          mean number of hits per bar that differ from the genre's base bar
+
+Usage:
+    python -m variation_search dnb -N 1000000 -k 8 --seed 0 -o midi_patterns
+"""
+import heapq
+import random
+
+from drum_pattern_generator import (
+    BARS_PER_VARIATION,
+    TICKS_PER_BAR,
+    TICKS_PER_BEAT,
+    DirectorySink,
+    count_unique_patterns,
+    generate_variation_files,
+    get_genre,
+    resolve_tempo,
+)
+
+METRICS = ("density", "syncopation", "fill_complexity", "distance")
+# Score = sum of weight * metric.
+DEFAULT_WEIGHTS = {"density": 0.0, "syncopation": 1.0, "fill_complexity": 0.1, "distance": 0.05}
+
+
+# --- Scoring ---
+def _offbeat_weight(tick):
+    pos = tick % TICKS_PER_BEAT
+    if pos == 0:
+        return 0.0
+    return 0.5 if pos == TICKS_PER_BEAT // 2 else 1.0
+
+
+def groove_metrics(genre, choices):
+    """
+    Computes the groove metrics of one choice vector from the genre's compiled template.
+
+    Parameters:
+        genre (str or CompiledPattern): Genre name or compiled pattern.
+        choices (tuple): Choice vector, as returned by CompiledPattern.choose.
+
+    Returns:
+        dict: One value per name in METRICS.
+    """
+    pattern = get_genre(genre) if isinstance(genre, str) else genre
+    bars = [set() for _ in range(BARS_PER_VARIATION)]
+    hits = 0
+    offbeat = 0.0
+    for inst, bar_list in pattern.template(choices).items():
+        for bar_offset, bar_hits in bar_list:
+            bar = bars[bar_offset // TICKS_PER_BAR]
+            for tick, _ in bar_hits:
+                bar.add((inst, tick))
+                offbeat += _offbeat_weight(tick)
+            hits += len(bar_hits)
+    base = {(inst, tick) for inst, base_hits in pattern.base.items() for tick, _ in base_hits}
+    # ABAC: bars 1 (B) and 3 (C) are the fills.
+    return {
+        "density": hits / BARS_PER_VARIATION,
+        "syncopation": offbeat / hits if hits else 0.0,
+        "fill_complexity": len(bars[1] ^ bars[0]) + len(bars[3] ^ bars[0]),
+        "distance": sum(len(bar ^ base) for bar in bars) / BARS_PER_VARIATION,
+    }
+
+
+def score_metrics(metrics, weights=None):
+    """Returns the weighted sum of a metrics dict (DEFAULT_WEIGHTS if weights is None)."""
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    return sum(weight * metrics[name] for name, weight in weights.items())
+
+
+# --- Candidate Scan ---
+def _first_variations(genre, seed_base, start, stop, limit=None):
+    """
+    Maps the fingerprint of each pattern drawn by variations start..stop-1 to (first variation
+    that drew it, its choice vector), stopping early once limit patterns have been found.
+    """
+    pattern = get_genre(genre)
+    choose = pattern.choose
+    fingerprint = pattern.fingerprint
+    # Reseeding one generator gives the same stream as make_rng(seed_base, var) per candidate.
+    rng = random.Random()
+    reseed = rng.seed
+    found = {}
+    for var in range(start, stop):
+        reseed(seed_base + var)
+        choices = choose(rng)
+        fp = fingerprint(choices)
+        if fp not in found:
+            found[fp] = (var, choices)
+            if len(found) == limit:
+                break
+    return found
+
+
+def search_variations(genre, num_candidates, top_k=10, seed_base=0, weights=None, score=None, workers=1, stop_when_complete=True):
+    """
+    Scores variations 1..num_candidates of a seeded run and returns the top_k distinct patterns.
+
+    Parameters:
+        genre (str): A registered genre, e.g. "house", "ukg", "dnb" or "breaks".
+        num_candidates (int): Number of seeded variations to consider.
+        top_k (int): Number of distinct patterns to keep (at least 1).
+        seed_base (int): Seed base of the run; candidate i draws from make_rng(seed_base, i).
+        weights (dict or None): Metric weights for score_metrics; DEFAULT_WEIGHTS if None.
+        score (callable or None): If given, called with a metrics dict and returns the score,
+            replacing weights.
+        workers (int): Processes to scan candidates on; 1 scans in this process.
+        stop_when_complete (bool): Stop scanning once every reachable pattern of the genre has
+            been seen. Disable to measure the raw scan rate.
+
+    Returns:
+        list: Up to top_k dicts with keys "variation", "choices", "score" and "metrics", best
+              first. Ties go to the lower variation number.
+    """
+    if top_k < 1:
+        raise ValueError("top_k must be at least 1.")
+    pattern = get_genre(genre)
+    if num_candidates < 1:
+        return []
+    limit = count_unique_patterns(genre) if stop_when_complete else None
+    stop = num_candidates + 1
+    if workers <= 1:
+        found = _first_variations(genre, seed_base, 1, stop, limit)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        size = -(-num_candidates // (workers * 4))
+        starts = list(range(1, stop, size))
+        found = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(
+                _first_variations,
+                [genre] * len(starts), [seed_base] * len(starts), starts,
+                [min(s + size, stop) for s in starts], [limit] * len(starts),
+            )
+            # Chunks come back in order, so the first variation of each pattern wins.
+            for part in parts:
+                for fp, first in part.items():
+                    found.setdefault(fp, first)
+
+    heap = []
+    for var, choices in found.values():
+        metrics = groove_metrics(pattern, choices)
+        value = score(metrics) if score is not None else score_metrics(metrics, weights)
+        item = (value, -var, choices, metrics)
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    heap.sort(key=lambda item: item[:2], reverse=True)
+    return [
+        {"variation": -neg_var, "choices": choices, "score": value, "metrics": metrics}
+        for value, neg_var, choices, metrics in heap
+    ]
+
+
+def save_search_results(genre, output_dir, results, seed_base=0, velocity_var=15, timing_var=0.02, tempo=None, writer="smf", layout="per_instrument", sink=None, metrics=None):
+    """
+    Generates, humanizes and writes the winning variations of a search.
+
+    Each winner is written by generate_variation_files under its own variation number, so its
+    files match what a full generate_midi_patterns run with the same seed_base writes.
+
+    Parameters:
+        genre (str): The genre that was searched.
+        output_dir (str): Top-level directory in which to save the MIDI files.
+        results (list): Results of search_variations.
+        seed_base (int): The seed base the search used.
+        velocity_var, timing_var, tempo, writer, layout, sink, metrics: As for
+            generate_midi_patterns ("per_genre" is not supported).
+
+    Returns:
+        dict: Mapping from variation number to its saved files, in results order.
+    """
+    tempo = resolve_tempo(genre, tempo)
+    if sink is None:
+        sink = DirectorySink(output_dir, metrics=metrics)
+    return {
+        result["variation"]: generate_variation_files(
+            genre, output_dir, result["variation"],
+            velocity_var=velocity_var, timing_var=timing_var, tempo=tempo, seed_base=seed_base,
+            writer=writer, layout=layout, sink=sink, metrics=metrics,
+        )
+        for result in results
+    }
+
+
+def _parse_weights(text):
+    weights = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric '{name}'. Choose from {', '.join(METRICS)}.")
+        weights[name] = float(value)
+    return weights
+
+
+def main(argv=None):
+    """Command line entry point: python -m variation_search GENRE [-N CANDIDATES] [-k TOP_K] [-o DIR]."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m variation_search", description="Keep the top-K seeded drum variations by groove metrics.")
+    parser.add_argument("genre", help="Genre to search, e.g. house, ukg, dnb or breaks.")
+    parser.add_argument("-N", "--candidates", type=int, default=1_000_000, help="Seeded variations to consider (default: 1000000).")
+    parser.add_argument("-k", "--top", type=int, default=10, help="Distinct patterns to keep (default: 10).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed base of the candidates (default: 0).")
+    parser.add_argument("-w", "--weights", default=None, metavar="NAME=W,...", help="Metric weights, e.g. syncopation=1,distance=0.2.")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="Processes to scan on (default: 1).")
+    parser.add_argument("-o", "--output-dir", default=None, help="Write the winners here; without it, only the table is printed.")
+    parser.add_argument("--layout", choices=("per_instrument", "per_variation"), default="per_instrument", help="Output layout (default: per_instrument).")
+    args = parser.parse_args(argv)
+
+    try:
+        get_genre(args.genre)
+        weights = None if args.weights is None else _parse_weights(args.weights)
+    except ValueError as exc:
+        parser.error(str(exc))
+    genre = args.genre.lower()
+
+    results = search_variations(genre, args.candidates, top_k=args.top, seed_base=args.seed, weights=weights, workers=args.workers)
+    print(f"{'variation':>10} {'score':>8} " + " ".join(f"{name:>15}" for name in METRICS))
+    for result in results:
+        print(f"{result['variation']:>10} {result['score']:>8.3f} " + " ".join(f"{result['metrics'][name]:>15.3f}" for name in METRICS))
+    if args.output_dir is not None:
+        save_search_results(genre, args.output_dir, results, seed_base=args.seed, layout=args.layout)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())